@@ -22,7 +22,13 @@ import {
 } from './constants';
 
 // Use Custom TTS for generation capability (async loading)
-import { playCustomTTS as speakText, playAudioUrl, stopCustomSpeech as stopSpeech } from './services/customTtsService';
+import {
+  playCustomTTS as speakText,
+  playAudioUrl,
+  prefetchCustomTTS,
+  scriptNameFromAudioUrl,
+  stopCustomSpeech as stopSpeech,
+} from './services/customTtsService';
 
 // API for data submission
 import { sendToGAS } from './api/sendToGAS';
@@ -185,6 +191,14 @@ const App: React.FC = () => {
       }
     }
 
+    // Let the backend render the likely next utterances while this one plays.
+    if (audioUrlToPlay) {
+      prefetchCustomTTS({
+        step: scriptNameFromAudioUrl(audioUrlToPlay),
+        context: userData.name ? { name: userData.name.trim() } : {},
+      });
+    }
+
     if (textToPlay) {
       const timer = setTimeout(() => {
         // Special case: Only the name chanting uses live TTS.
@@ -252,6 +266,15 @@ const App: React.FC = () => {
     }
   }, [currentStepIndex, hasStarted]);
 
+  // Step 1: render the live name greeting of step 2 while the name is still being typed.
+  useEffect(() => {
+    if (currentStepId !== StepId.STEP_01_GREETING) return;
+    const name = inputValue.trim();
+    if (!name) return;
+    const timer = setTimeout(() => prefetchCustomTTS({ texts: [`${name}你好`] }), 500);
+    return () => clearTimeout(timer);
+  }, [currentStepId, inputValue]);
+
   // Submit data to GAS when reaching STEP_13_END (only once)
   useEffect(() => {
     if (currentStepId === StepId.STEP_13_END && !hasSentDataRef.current) {
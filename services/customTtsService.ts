@@ -5,8 +5,10 @@ import { SYSTEM_CONFIG } from '../constants';
 const TTS_API_BASE_URL = import.meta.env.VITE_TTS_API_BASE_URL ?? 'http://localhost:8000';
 
 let currentAudio: HTMLAudioElement | null = null;
+let ttsSocket: TtsSocket | null = null;
 
 export const stopCustomSpeech = () => {
+  ttsSocket?.stop();
   if (currentAudio) {
     currentAudio.pause();
     currentAudio.currentTime = 0;
@@ -43,6 +45,261 @@ export const playAudioUrl = async (audioUrl: string, onEnd?: () => void) => {
   }
 };
 
+// Ask the backend to synthesize likely upcoming utterances into its cache.
+// `step` is the SCRIPTS name of the step now playing (e.g. '03_video_quiz');
+// `texts` are explicit lines, e.g. a personalized greeting. Fire-and-forget:
+// failures only mean the later /tts call is not a cache hit.
+export const prefetchCustomTTS = (
+  request: { step?: string; texts?: string[]; context?: Record<string, string>; speed?: number }
+) => {
+  const url = new URL('/tts/prefetch', TTS_API_BASE_URL);
+  fetch(url.toString(), {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      step: request.step,
+      texts: request.texts ?? [],
+      context: request.context ?? {},
+      speed: request.speed ?? 1.0,
+      sid: 0,
+    }),
+    keepalive: true,
+  }).catch((error) => {
+    console.warn('TTS prefetch failed', error);
+  });
+};
+
+// SCRIPTS name of a pre-recorded clip URL ('/tts/03_video_quiz.wav' -> '03_video_quiz').
+export const scriptNameFromAudioUrl = (audioUrl: string) =>
+  audioUrl.split('/').pop()?.replace(/\.wav$/, '') ?? '';
+
+// Live synthesis goes over one long-lived WebSocket (/tts/ws) and playback
+// starts with the first sentence; set VITE_TTS_TRANSPORT=http to fetch each
+// utterance as a whole file instead. Either way a failure before any audio
+// falls back to the next option below.
+const TTS_TRANSPORT = import.meta.env.VITE_TTS_TRANSPORT ?? 'ws';
+// Sentences the server may send ahead of playback before waiting for an ack.
+const TTS_WS_WINDOW = 4;
+
+type StreamedUtterance = {
+  id: string;
+  seq?: number;
+  sampleRate: number;
+  playAt: number;
+  sources: Set<AudioBufferSourceNode>;
+  chunks: number;
+  finished: boolean;
+  // true once played to the end, false when stopped.
+  resolve: (played: boolean) => void;
+  reject: (error: Error) => void;
+};
+
+class TtsSocket {
+  private socket: WebSocket | null = null;
+  private opening: Promise<WebSocket> | null = null;
+  private context: AudioContext | null = null;
+  private utterances = new Map<string, StreamedUtterance>();
+  private bySeq = new Map<number, StreamedUtterance>();
+  private nextId = 0;
+
+  private connect(): Promise<WebSocket> {
+    if (this.socket?.readyState === WebSocket.OPEN) return Promise.resolve(this.socket);
+    if (this.opening) return this.opening;
+
+    const url = new URL('/tts/ws', TTS_API_BASE_URL);
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    this.opening = new Promise((resolve, reject) => {
+      const socket = new WebSocket(url.toString());
+      socket.binaryType = 'arraybuffer';
+      socket.onopen = () => {
+        this.socket = socket;
+        this.opening = null;
+        resolve(socket);
+      };
+      socket.onerror = () => {
+        if (this.opening) {
+          this.opening = null;
+          reject(new Error('TTS WebSocket connection failed'));
+        }
+      };
+      socket.onclose = () => {
+        if (this.socket === socket) this.socket = null;
+        this.utterances.forEach((u) => this.fail(u, new Error('TTS WebSocket closed')));
+      };
+      socket.onmessage = (event) => {
+        if (typeof event.data === 'string') {
+          this.onMessage(JSON.parse(event.data));
+        } else {
+          this.onFrame(event.data as ArrayBuffer);
+        }
+      };
+    });
+    return this.opening;
+  }
+
+  private send(message: object) {
+    if (this.socket?.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(message));
+    }
+  }
+
+  // Resolves once the utterance has finished playing (or was stopped); rejects
+  // (so the caller can fall back) only if it fails before any audio was played.
+  async speak(text: string, speed: number): Promise<boolean> {
+    const socket = await this.connect();
+    if (!this.context) this.context = new AudioContext();
+    void this.context.resume();
+
+    const id = String(++this.nextId);
+    return new Promise<boolean>((resolve, reject) => {
+      this.utterances.set(id, {
+        id,
+        sampleRate: 0,
+        playAt: 0,
+        sources: new Set(),
+        chunks: 0,
+        finished: false,
+        resolve,
+        reject,
+      });
+      socket.send(JSON.stringify({ type: 'synthesize', id, text, speed, sid: 0, window: TTS_WS_WINDOW }));
+    });
+  }
+
+  // Silence and drop every utterance (resolving their promises).
+  stop() {
+    this.utterances.forEach((u) => {
+      this.send({ type: 'cancel', id: u.id });
+      u.sources.forEach((source) => {
+        source.onended = null;
+        source.stop();
+      });
+      this.forget(u);
+      u.resolve(false);
+    });
+  }
+
+  private forget(u: StreamedUtterance) {
+    this.utterances.delete(u.id);
+    if (u.seq !== undefined) this.bySeq.delete(u.seq);
+  }
+
+  private fail(u: StreamedUtterance, error: Error) {
+    this.forget(u);
+    if (u.chunks === 0) {
+      u.reject(error);
+    } else {
+      // Part of it was heard; end after what was scheduled rather than repeat it.
+      u.finished = true;
+      if (u.sources.size === 0) u.resolve(true);
+    }
+  }
+
+  private onMessage(message: { type: string; id?: string; seq?: number; sample_rate?: number; detail?: string }) {
+    const u = message.id !== undefined ? this.utterances.get(message.id) : undefined;
+    if (!u) {
+      if (message.type === 'error') console.warn('TTS WebSocket error', message.detail);
+      return;
+    }
+    switch (message.type) {
+      case 'queued':
+        u.seq = message.seq;
+        this.bySeq.set(u.seq!, u);
+        break;
+      case 'start':
+        u.sampleRate = message.sample_rate!;
+        break;
+      case 'end':
+      case 'cancelled':
+        u.finished = true;
+        if (u.sources.size === 0) {
+          this.forget(u);
+          u.resolve(true);
+        }
+        break;
+      case 'error':
+        this.fail(u, new Error(`TTS API Error: ${message.detail}`));
+        break;
+    }
+  }
+
+  // Frame: uint32 seq, uint32 chunk index (little-endian), then 16-bit PCM.
+  private onFrame(data: ArrayBuffer) {
+    const view = new DataView(data);
+    const u = this.bySeq.get(view.getUint32(0, true));
+    const context = this.context;
+    if (!u || !context) return;
+    const chunk = view.getUint32(4, true);
+
+    const pcm = new Int16Array(data, 8);
+    const buffer = context.createBuffer(1, pcm.length, u.sampleRate);
+    const samples = buffer.getChannelData(0);
+    for (let i = 0; i < pcm.length; i++) samples[i] = pcm[i] / 32768;
+
+    const source = context.createBufferSource();
+    source.buffer = buffer;
+    source.connect(context.destination);
+    u.playAt = Math.max(u.playAt, context.currentTime);
+    source.start(u.playAt);
+    u.playAt += buffer.duration;
+    u.sources.add(source);
+    u.chunks += 1;
+    source.onended = () => {
+      u.sources.delete(source);
+      if (u.finished && u.sources.size === 0) {
+        this.forget(u);
+        u.resolve(true);
+      }
+    };
+    this.send({ type: 'ack', id: u.id, chunk });
+  }
+}
+
+const playStreamedTTS = (text: string, speed: number) => {
+  if (!ttsSocket) ttsSocket = new TtsSocket();
+  return ttsSocket.speak(text, speed);
+};
+
+const playFetchedTTS = async (text: string, speed: number, onEnd?: () => void) => {
+  const url = new URL('/tts', TTS_API_BASE_URL);
+  url.searchParams.set('text', text);
+  url.searchParams.set('speed', String(speed));
+  url.searchParams.set('sid', '0');
+
+  const response = await fetch(url.toString(), { method: 'POST' });
+
+  if (!response.ok) {
+    throw new Error(`TTS API Error: ${response.statusText}`);
+  }
+
+  // Get the audio blob
+  const audioBlob = await response.blob();
+  const audioUrl = URL.createObjectURL(audioBlob);
+  const audio = new Audio(audioUrl);
+  // `speed` is applied by the server (the streamed path relies on that too);
+  // setting playbackRate here as well would apply it twice.
+
+  currentAudio = audio;
+
+  audio.onended = () => {
+    URL.revokeObjectURL(audioUrl); // Cleanup
+    if (currentAudio === audio) {
+      currentAudio = null;
+    }
+    if (onEnd) onEnd();
+  };
+
+  audio.onerror = (e) => {
+    console.error("Audio playback error", e);
+    if (currentAudio === audio) {
+      currentAudio = null;
+    }
+    if (onEnd) onEnd();
+  };
+
+  await audio.play();
+};
+
 export const playCustomTTS = async (
   text: string, 
   options: { speed?: number; gender?: 'male' | 'female'; engine?: 'auto' | 'local' | 'gtts' | 'gemini' } = {},
@@ -58,46 +315,20 @@ export const playCustomTTS = async (
   const engine = options.engine ?? 'auto';
 
   try {
-    const url = new URL('/tts', TTS_API_BASE_URL);
-    url.searchParams.set('text', text);
-    url.searchParams.set('speed', String(speed));
-    url.searchParams.set('sid', '0');
-
-    const response = await fetch(url.toString(), { method: 'POST' });
-
-    if (!response.ok) {
-      throw new Error(`TTS API Error: ${response.statusText}`);
-    }
-
-    // Get the audio blob
-    const audioBlob = await response.blob();
-    const audioUrl = URL.createObjectURL(audioBlob);
-    const audio = new Audio(audioUrl);
-    
-    // Apply playback rate on the client side
-    audio.playbackRate = speed;
-    // Optional: preserve pitch when changing speed (default is true usually, but good to be explicit if needed)
-    // audio.preservesPitch = true; 
-
-    currentAudio = audio;
-
-    audio.onended = () => {
-      URL.revokeObjectURL(audioUrl); // Cleanup
-      if (currentAudio === audio) {
-        currentAudio = null;
+    if (TTS_TRANSPORT === 'ws' && typeof WebSocket !== 'undefined' && typeof AudioContext !== 'undefined') {
+      let played: boolean | null = null;
+      try {
+        played = await playStreamedTTS(text, speed);
+      } catch (error) {
+        console.warn('Streaming TTS failed, fetching the whole file instead:', error);
       }
-      if (onEnd) onEnd();
-    };
-
-    audio.onerror = (e) => {
-      console.error("Audio playback error", e);
-      if (currentAudio === audio) {
-        currentAudio = null;
+      if (played !== null) {
+        // Like a paused <audio>, a stopped utterance does not report its end.
+        if (played && onEnd) onEnd();
+        return;
       }
-      if (onEnd) onEnd();
-    };
-
-    await audio.play();
+    }
+    await playFetchedTTS(text, speed, onEnd);
 
   } catch (error) {
     // If caller explicitly wants backend/local engine, do NOT fall back.
@@ -0,0 +1,477 @@
+"""Latency / throughput benchmark for the TTS backend.
+
+Modes:
+- engine: call `SherpaMatchaTTS.synthesize` directly (no HTTP, no cache)
+- http:   drive the FastAPI app in-process through its full stack
+          (scheduler, pool, cache) at a given concurrency
+- tune:   try pool size / thread / pinning layouts on this host and write
+          the fastest one as a TTS_ENGINE_CONFIG file
+- quantize: synthesize every `SCRIPTS` text with the float models and with
+          INT8 acoustic model / vocoder / both (see `quantize_models.py`),
+          reporting latency, RTF, memory and the mel distance to the float audio
+- speed:  for every `SCRIPTS` text, compare native Matcha `speed` with
+          time-stretching the speed-1.0 audio (TTS_SPEED_MODE wsola/vocoder):
+          latency, RTF and the mel distance of the stretched to the native audio
+
+Texts are sampled from the real `SCRIPTS` corpus so the length
+distribution matches production. `--stub` swaps in `StubTTS` so the
+HTTP/queueing layers can be measured without model files.
+
+The JSON report is stable and sorted so two runs can be diffed:
+
+    python benchmark.py http --stub --concurrency 8 --output before.json
+    python benchmark.py tune --requests 40 --write-config engine_config.json
+    python benchmark.py quantize --output quantize_report.json
+    python benchmark.py speed --speeds 0.8,1.25,1.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import replace
+
+import numpy as np
+import soundfile as sf
+
+
+def _corpus() -> list[str]:
+    from generate_fixed_audio import SCRIPTS
+
+    return [t.strip() for t in SCRIPTS.values() if t and t.strip()]
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _wav_duration(data: bytes) -> float:
+    return sf.info(io.BytesIO(data)).duration
+
+
+def _percentiles(values: list[float], scale: float = 1.0) -> dict:
+    if not values:
+        return {}
+    arr = np.asarray(values) * scale
+    return {
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def _measurements(samples: list[tuple[float, float]], errors: int, wall: float) -> dict:
+    latencies = [lat for lat, _ in samples]
+    audio = [dur for _, dur in samples]
+    rtf = [lat / dur for lat, dur in samples if dur > 0]
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "latency_ms": _percentiles(latencies, 1000.0),
+        "rtf": _percentiles(rtf),
+        "throughput": {
+            "requests_per_second": round(len(samples) / wall, 3) if wall else 0.0,
+            "audio_seconds_per_second": round(sum(audio) / wall, 3) if wall else 0.0,
+        },
+    }
+
+
+def _report(args: argparse.Namespace, samples: list[tuple[float, float]], errors: int, wall: float) -> dict:
+    return {
+        "commit": _git_commit(),
+        "mode": args.mode,
+        "stub": args.stub,
+        "concurrency": args.concurrency,
+        **_measurements(samples, errors, wall),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _drive(engine, texts: list[str], warmup: int, concurrency: int) -> tuple[list[tuple[float, float]], int, float]:
+    for text in texts[:warmup]:
+        engine.synthesize(text)
+
+    samples: list[tuple[float, float]] = []
+    errors = 0
+    lock = threading.Lock()
+    todo = iter(texts[warmup:])
+
+    def _worker() -> None:
+        nonlocal errors
+        while True:
+            with lock:
+                text = next(todo, None)
+            if text is None:
+                return
+            start = time.perf_counter()
+            try:
+                data = engine.synthesize(text)
+            except Exception:
+                with lock:
+                    errors += 1
+                continue
+            latency = time.perf_counter() - start
+            with lock:
+                samples.append((latency, _wav_duration(data)))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=_worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - start
+
+
+def _run_engine(args: argparse.Namespace, texts: list[str]) -> dict:
+    if args.stub:
+        from tts_adapter import StubTTS
+
+        engine = StubTTS(rtf=args.stub_rtf)
+    else:
+        from tts_adapter import SherpaMatchaTTS, sherpa_matcha_paths_from_env
+
+        engine = SherpaMatchaTTS(
+            sherpa_matcha_paths_from_env(),
+            num_threads=int(os.environ.get("TTS_NUM_THREADS", "4")),
+        )
+
+    return _report(args, *_drive(engine, texts, args.warmup, args.concurrency))
+
+
+def _layouts(args: argparse.Namespace, cpus: int) -> list[dict]:
+    """Candidate engine layouts that use every usable core: pool size x vocoder threads x pinning."""
+    pools = args.pool_sizes or [p for p in (1, 2, 4, 8, 16) if p <= cpus] or [1]
+    layouts = []
+    for pool in pools:
+        threads = max(1, cpus // pool)
+        # The vocoder is much lighter than the acoustic model; it may not need every thread.
+        for vocoder in sorted({threads, max(1, threads // 2)}, reverse=True):
+            for pin in (False, True) if pool > 1 else (False,):
+                layout = {"pool_size": pool, "num_threads": threads, "pin_threads": pin}
+                if vocoder != threads:
+                    layout["vocoder_threads"] = vocoder
+                layouts.append(layout)
+    return layouts
+
+
+def _run_tune(args: argparse.Namespace, texts: list[str]) -> dict:
+    if args.stub:
+        os.environ["TTS_ENGINE"] = "stub"
+        os.environ["TTS_STUB_RTF"] = str(args.stub_rtf)
+
+    from tts_adapter import build_engine, default_model_spec, memory, usable_cpus
+
+    base = default_model_spec()
+    cpus = len(usable_cpus())
+    results = []
+    for layout in _layouts(args, cpus):
+        tuning = replace(
+            base.tuning,
+            pin_threads=layout["pin_threads"],
+            vocoder_threads=layout.get("vocoder_threads", 0),
+        )
+        spec = replace(base, pool_size=layout["pool_size"], num_threads=layout["num_threads"], tuning=tuning)
+        engine = build_engine(spec)
+        # Enough callers to keep every pool instance busy.
+        result = _measurements(*_drive(engine, texts, args.warmup, 2 * spec.pool_size))
+        print(f"{json.dumps(layout, sort_keys=True)}: {result['throughput']}", file=sys.stderr)
+        results.append({"layout": layout, **result})
+        del engine
+        memory.trim()
+
+    eligible = [r for r in results if not r["errors"]]
+    if args.max_p95_ms:
+        eligible = [r for r in eligible if r["latency_ms"].get("p95", 0) <= args.max_p95_ms]
+    best = max(eligible, key=lambda r: r["throughput"]["audio_seconds_per_second"], default=None)
+    if best is not None and args.write_config:
+        config = {"provider": base.tuning.provider, **best["layout"]}
+        with open(args.write_config, "w", encoding="utf-8") as f:
+            f.write(json.dumps(config, indent=2, sort_keys=True) + "\n")
+    return {
+        "commit": _git_commit(),
+        "mode": args.mode,
+        "stub": args.stub,
+        "cpus": cpus,
+        "best": best["layout"] if best is not None else None,
+        "layouts": results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_quantize(args: argparse.Namespace) -> dict:
+    import gc
+
+    from tts_adapter import SherpaMatchaTTS, mel_distance, memory, quantized_model, sherpa_matcha_paths_from_env
+
+    base = sherpa_matcha_paths_from_env()
+    num_threads = int(os.environ.get("TTS_NUM_THREADS", "4"))
+    # Every text once, in a fixed order, so variants compare utterance by utterance.
+    texts = _corpus()
+    variants = {"float": ()}
+    for name in args.variants:
+        variants[name] = ("acoustic", "vocoder") if name == "all" else (name,)
+
+    def _paths(targets: tuple[str, ...]):
+        out_dir = os.environ.get("TTS_QUANTIZED_DIR", "")
+        fields = {"acoustic": "acoustic_model", "vocoder": "vocoder"}
+        updates = {}
+        for target in targets:
+            src = getattr(base, fields[target])
+            updates[fields[target]] = quantized_model(src, out_dir or os.path.dirname(src))
+        return replace(base, **updates)
+
+    reference: list[np.ndarray] = []
+    results: dict[str, dict] = {}
+    for name, targets in variants.items():
+        paths = _paths(targets)
+        gc.collect()
+        memory.trim()
+        rss_before = memory.rss_bytes()
+        start = time.perf_counter()
+        engine = SherpaMatchaTTS(paths, num_threads=num_threads)
+        load_seconds = time.perf_counter() - start
+        for text in texts[: args.warmup]:
+            engine.generate(text)
+
+        samples, outputs = [], []
+        wall = time.perf_counter()
+        for text in texts:
+            start = time.perf_counter()
+            audio = engine.generate(text)
+            samples.append((time.perf_counter() - start, audio.duration))
+            outputs.append(audio.samples)
+        wall = time.perf_counter() - wall
+        distances = []
+        if name == "float":
+            reference = outputs
+        else:
+            # Compared after the timed loop so the metric does not count as synthesis time.
+            distances = [mel_distance(ref, out, engine.sample_rate) for ref, out in zip(reference, outputs)]
+
+        result = {
+            "targets": list(targets),
+            "model_mb": round(sum(os.path.getsize(p) for p in (paths.acoustic_model, paths.vocoder)) / 2**20, 2),
+            "load_seconds": round(load_seconds, 3),
+            "rss_mb": round((memory.rss_bytes() - rss_before) / 2**20, 1),
+            **_measurements(samples, 0, wall),
+        }
+        if name != "float":
+            result["mel_distance_db"] = _percentiles([d["mel_distance_db"] for d in distances])
+            result["duration_ratio"] = _percentiles([d["duration_ratio"] for d in distances])
+            result["speedup"] = round(results["float"]["wall_seconds"] / wall, 3) if wall else None
+        print(f"{name}: {result['rtf']} {result.get('mel_distance_db', '')}", file=sys.stderr)
+        results[name] = result
+        del engine
+
+    return {
+        "commit": _git_commit(),
+        "mode": args.mode,
+        "num_threads": num_threads,
+        "texts": len(texts),
+        "variants": results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_speed(args: argparse.Namespace) -> dict:
+    from tts_adapter import SPEED_MODES, mel_distance, time_stretch
+
+    if args.stub:
+        from tts_adapter import StubTTS
+
+        engine = StubTTS(rtf=args.stub_rtf)
+    else:
+        from tts_adapter import SherpaMatchaTTS, sherpa_matcha_paths_from_env
+
+        engine = SherpaMatchaTTS(
+            sherpa_matcha_paths_from_env(),
+            num_threads=int(os.environ.get("TTS_NUM_THREADS", "4")),
+        )
+
+    texts = _corpus()
+    methods = [m for m in SPEED_MODES if m != "native"]
+    for text in texts[: args.warmup]:
+        engine.generate(text)
+
+    # speed -> method -> [(seconds, output duration)] / [mel_distance dicts]
+    timings = {s: {m: [] for m in ("native", *methods)} for s in args.speeds}
+    distances = {s: {m: [] for m in methods} for s in args.speeds}
+    for text in texts:
+        base = engine.generate(text)
+        for speed in args.speeds:
+            start = time.perf_counter()
+            native = engine.generate(text, speed=speed)
+            timings[speed]["native"].append((time.perf_counter() - start, native.duration))
+            for method in methods:
+                start = time.perf_counter()
+                stretched = time_stretch(base.samples, speed, base.sample_rate, method=method)
+                elapsed = time.perf_counter() - start
+                timings[speed][method].append((elapsed, len(stretched) / base.sample_rate))
+                distances[speed][method].append(mel_distance(native.samples, stretched, base.sample_rate))
+
+    speeds = {}
+    for speed in args.speeds:
+        entry = {}
+        for method, samples in timings[speed].items():
+            entry[method] = {
+                "latency_ms": _percentiles([t for t, _ in samples], 1000.0),
+                "rtf": _percentiles([t / d for t, d in samples if d > 0]),
+            }
+            compared = distances[speed].get(method)
+            if compared:
+                entry[method]["mel_distance_db"] = _percentiles([d["mel_distance_db"] for d in compared])
+                entry[method]["duration_ratio"] = _percentiles([d["duration_ratio"] for d in compared])
+        speeds[str(speed)] = entry
+        summary = ", ".join(f"{m} {e['latency_ms']['p50']}ms" for m, e in entry.items())
+        print(f"speed {speed}: {summary}", file=sys.stderr)
+
+    return {
+        "commit": _git_commit(),
+        "mode": args.mode,
+        "stub": args.stub,
+        "texts": len(texts),
+        "speeds": speeds,
+    }
+
+
+async def _run_http(args: argparse.Namespace, texts: list[str]) -> dict:
+    import httpx
+
+    if args.stub:
+        os.environ["TTS_ENGINE"] = "stub"
+        os.environ.setdefault("TTS_STUB_RTF", str(args.stub_rtf))
+    if not args.cache:
+        os.environ["TTS_CACHE_MAX_BYTES"] = "0"
+        os.environ["TTS_SEGMENT_CACHE_MAX_BYTES"] = "0"
+        os.environ.pop("TTS_CACHE_DIR", None)
+
+    import server
+
+    samples: list[tuple[float, float]] = []
+    errors = 0
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # Warm-up runs in the background after startup; keep it out of the measurement.
+            while (ready := await client.get("/ready")).status_code != 200:
+                if ready.json().get("detail") != "warming up":
+                    raise SystemExit(f"TTS server not ready: {ready.json().get('detail')}")
+                await asyncio.sleep(0.05)
+
+            async def _one(text: str) -> tuple[float, float] | None:
+                start = time.perf_counter()
+                r = await client.post("/tts", params={"text": text})
+                latency = time.perf_counter() - start
+                if r.status_code != 200:
+                    return None
+                return latency, _wav_duration(r.content)
+
+            for text in texts[: args.warmup]:
+                await _one(text)
+
+            queue: asyncio.Queue[str] = asyncio.Queue()
+            for text in texts[args.warmup :]:
+                queue.put_nowait(text)
+
+            async def _worker() -> None:
+                nonlocal errors
+                while not queue.empty():
+                    result = await _one(queue.get_nowait())
+                    if result is None:
+                        errors += 1
+                    else:
+                        samples.append(result)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(_worker() for _ in range(args.concurrency)))
+            wall = time.perf_counter() - start
+
+    return _report(args, samples, errors, wall)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("engine", "http", "tune", "quantize", "speed"))
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests (after warm-up).")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub", action="store_true", help="Use StubTTS instead of the Matcha model.")
+    parser.add_argument("--stub-rtf", type=float, default=0.1, help="Simulated real-time factor of the stub.")
+    parser.add_argument(
+        "--cache", action="store_true", help="http mode: keep the synthesis and segment caches enabled."
+    )
+    parser.add_argument("--output", default="", help="Write the JSON report here instead of stdout.")
+    parser.add_argument(
+        "--pool-sizes", type=lambda s: [int(v) for v in s.split(",")], default=None,
+        help="tune mode: comma-separated pool sizes to try (default: powers of two up to the core count).",
+    )
+    parser.add_argument("--max-p95-ms", type=float, default=0.0, help="tune mode: ignore layouts slower than this.")
+    parser.add_argument(
+        "--write-config", default="engine_config.json", help="tune mode: where to write the winning layout."
+    )
+    parser.add_argument(
+        "--variants", type=lambda s: [v.strip() for v in s.split(",") if v.strip()],
+        default=["acoustic", "vocoder", "all"],
+        help="quantize mode: INT8 variants to compare with float (acoustic, vocoder, all).",
+    )
+    parser.add_argument(
+        "--speeds", type=lambda s: [float(v) for v in s.split(",")], default=[0.8, 1.25, 1.5],
+        help="speed mode: speeds to compare (1.0 is the stretch source).",
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = _corpus()
+    texts = [rng.choice(corpus) for _ in range(args.warmup + args.requests)]
+
+    if args.mode == "engine":
+        report = _run_engine(args, texts)
+    elif args.mode == "tune":
+        report = _run_tune(args, texts)
+    elif args.mode == "quantize":
+        report = _run_quantize(args)
+    elif args.mode == "speed":
+        report = _run_speed(args)
+    else:
+        report = asyncio.run(_run_http(args, texts))
+
+    data = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
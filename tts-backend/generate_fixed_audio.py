@@ -1,15 +1,32 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import io
+import json
 import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import sherpa_onnx
 import soundfile as sf
 
+MANIFEST_NAME = ".manifest.json"
 
-def _build_tts() -> sherpa_onnx.OfflineTts:
+
+def _model_files() -> list[Path]:
+    base_dir = Path(os.environ.get("SHERPA_MATCHA_DIR", "models/matcha-zh-en"))
+    return [
+        Path(os.environ.get("SHERPA_MATCHA_ACOUSTIC_MODEL", str(base_dir / "model-steps-3.onnx"))),
+        Path(os.environ.get("SHERPA_MATCHA_VOCODER", str(base_dir / "vocos-16khz-univ.onnx"))),
+        Path(os.environ.get("SHERPA_MATCHA_TOKENS", str(base_dir / "tokens.txt"))),
+        Path(os.environ.get("SHERPA_MATCHA_LEXICON", str(base_dir / "lexicon.txt"))),
+    ]
+
+
+def _build_tts(num_threads: int | None = None) -> sherpa_onnx.OfflineTts:
     base_dir = Path(os.environ.get("SHERPA_MATCHA_DIR", "models/matcha-zh-en"))
 
     acoustic_model = Path(os.environ.get("SHERPA_MATCHA_ACOUSTIC_MODEL", str(base_dir / "model-steps-3.onnx")))
@@ -44,7 +61,7 @@ def _build_tts() -> sherpa_onnx.OfflineTts:
             dict_dir="",
         ),
         provider="cpu",
-        num_threads=int(os.environ.get("TTS_NUM_THREADS", "4")),
+        num_threads=num_threads or int(os.environ.get("TTS_NUM_THREADS", "4")),
         debug=False,
     )
 
@@ -60,11 +77,86 @@ def _build_tts() -> sherpa_onnx.OfflineTts:
     return sherpa_onnx.OfflineTts(config)
 
 
-def _write_wav(path: Path, samples, sample_rate: int) -> None:
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write via a temp file + rename so readers never see a half-written file."""
     path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_wav(path: Path, samples, sample_rate: int) -> None:
     buf = io.BytesIO()
     sf.write(buf, samples, sample_rate, format="WAV")
-    path.write_bytes(buf.getvalue())
+    _atomic_write(path, buf.getvalue())
+
+
+def model_checksum() -> str:
+    """sha256 over the contents of every model file (and the rule fsts)."""
+    files = _model_files()
+    rule_fsts = os.environ.get("SHERPA_MATCHA_RULE_FSTS")
+    if rule_fsts is None:
+        base_dir = Path(os.environ.get("SHERPA_MATCHA_DIR", "models/matcha-zh-en"))
+        files += [base_dir / name for name in ("phone-zh.fst", "date-zh.fst", "number-zh.fst")]
+    else:
+        files += [Path(p) for p in rule_fsts.split(",") if p]
+
+    h = hashlib.sha256()
+    for p in files:
+        h.update(p.name.encode("utf-8"))
+        if p.is_file():
+            with p.open("rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    return h.hexdigest()
+
+
+def content_hash(text: str, *, sid: int, speed: float, model: str) -> str:
+    payload = json.dumps([text, sid, speed, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# filename -> {"hash", "text", "sid", "speed"}; the server's prompt bank reads
+# the same file to map request text back to pre-rendered audio.
+Manifest = dict[str, dict]
+
+
+def _load_manifest(out_dir: Path) -> Manifest:
+    try:
+        manifest = json.loads((out_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+    if not isinstance(manifest, dict):
+        return {}
+    # Legacy filename -> hash entries (and anything else that is not an object) count as stale.
+    return {name: entry for name, entry in manifest.items() if isinstance(entry, dict)}
+
+
+def _save_manifest(out_dir: Path, manifest: Manifest) -> None:
+    data = json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True)
+    _atomic_write(out_dir / MANIFEST_NAME, data.encode("utf-8"))
+
+
+# One OfflineTts per worker process, built once by the pool initializer.
+_worker_tts: sherpa_onnx.OfflineTts | None = None
+
+
+def _init_worker(num_threads: int) -> None:
+    global _worker_tts
+    _worker_tts = _build_tts(num_threads)
+
+
+def _render(filename: str, text: str, sid: int, speed: float, out_dir: str) -> tuple[str, float]:
+    assert _worker_tts is not None
+    start = time.perf_counter()
+    audio = _worker_tts.generate(text=text, sid=sid, speed=speed)
+    _write_wav(Path(out_dir) / filename, audio.samples, audio.sample_rate)
+    return filename, time.perf_counter() - start
 
 
 SCRIPTS: dict[str, str] = {
@@ -116,19 +208,53 @@ def main() -> None:
     parser.add_argument("--out-dir", default="/out")
     parser.add_argument("--sid", type=int, default=0)
     parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Worker processes, one OfflineTts each (default: cores / TTS_NUM_THREADS).",
+    )
+    parser.add_argument("--force", action="store_true", help="Re-render even if the manifest says unchanged.")
     args = parser.parse_args()
 
-    tts = _build_tts()
     out_dir = Path(args.out_dir)
+    model = model_checksum()
+    manifest = _load_manifest(out_dir)
 
+    pending: list[tuple[str, str, str]] = []
     for filename, text in SCRIPTS.items():
         text = (text or "").strip()
         if not text:
             continue
-        audio = tts.generate(text=text, sid=args.sid, speed=args.speed)
-        out_path = out_dir / filename
-        _write_wav(out_path, audio.samples, audio.sample_rate)
-        print(f"Wrote {out_path}")
+        digest = content_hash(text, sid=args.sid, speed=args.speed, model=model)
+        entry = manifest.get(filename) or {}
+        if not args.force and entry.get("hash") == digest and (out_dir / filename).exists():
+            print(f"Unchanged {out_dir / filename}")
+            continue
+        pending.append((filename, text, digest))
+
+    if not pending:
+        return
+
+    num_threads = int(os.environ.get("TTS_NUM_THREADS", "4"))
+    jobs = args.jobs or max(1, (os.cpu_count() or 1) // num_threads)
+    jobs = min(jobs, len(pending))
+    entries = {
+        filename: {"hash": digest, "text": text, "sid": args.sid, "speed": args.speed}
+        for filename, text, digest in pending
+    }
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(num_threads,)) as pool:
+        futures = [
+            pool.submit(_render, filename, text, args.sid, args.speed, str(out_dir))
+            for filename, text, _ in pending
+        ]
+        for future in as_completed(futures):
+            filename, elapsed = future.result()
+            # Persist after every file so an interrupted run keeps its progress.
+            manifest[filename] = entries[filename]
+            _save_manifest(out_dir, manifest)
+            print(f"Wrote {out_dir / filename} ({elapsed:.2f}s)")
 
 
 if __name__ == "__main__":
@@ -2,8 +2,18 @@ from __future__ import annotations
 
 import argparse
 import io
+import json
 import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 
 import sherpa_onnx
 import soundfile as sf
@@ -16,22 +26,28 @@ def _require_path(p: str, label: str) -> None:
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Minimal offline TTS CLI wrapper for sherpa-onnx MatchaTTS (zh + en)."
+        description="Minimal offline TTS CLI wrapper for sherpa-onnx MatchaTTS (zh + en).",
+        epilog=(
+            "With --jobs or --socket the models are loaded once and reused: each JSONL job is "
+            '{"text": ..., "output": "out.wav", "sid": 0, "speed": 1.0, "id": ...} '
+            "(sid/speed default to --sid/--speed, id to the line number), and one JSON result "
+            "line per job is written as it finishes."
+        ),
     )
 
     parser.add_argument(
         "--matcha-acoustic-model",
-        required=True,
+        default="",
         help="Path to acoustic model, e.g. model-steps-3.onnx",
     )
     parser.add_argument(
         "--matcha-vocoder",
-        required=True,
+        default="",
         help="Path to vocoder model, e.g. vocos-16khz-univ.onnx",
     )
     parser.add_argument(
         "--matcha-tokens",
-        required=True,
+        default="",
         help="Path to tokens.txt",
     )
     parser.add_argument(
@@ -56,21 +72,51 @@ def _parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--output-wav",
-        required=True,
-        help="Output wav path.",
+        default="",
+        help="Output wav path (single-utterance mode).",
     )
     parser.add_argument("--sid", type=int, default=0)
     parser.add_argument("--speed", type=float, default=1.0)
     parser.add_argument("--num-threads", type=int, default=4)
 
-    parser.add_argument("text", help="Text to synthesize")
+    parser.add_argument(
+        "--jobs",
+        default="",
+        help="Read JSONL jobs from this file ('-' for stdin) instead of synthesizing one text.",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Jobs synthesized at once; one engine (--num-threads threads each) is loaded per slot.",
+    )
+    parser.add_argument(
+        "--socket",
+        default="",
+        help="Stay resident and accept JSONL jobs on this Unix socket path.",
+    )
+    parser.add_argument(
+        "--connect",
+        default="",
+        help="Send the text (or --jobs) to a daemon started with --socket instead of loading models.",
+    )
 
-    return parser.parse_args()
+    parser.add_argument("text", nargs="?", default=None, help="Text to synthesize")
 
+    args = parser.parse_args()
+    if args.socket and args.connect:
+        parser.error("--socket and --connect are mutually exclusive")
+    if not args.jobs and not args.socket:
+        if args.text is None or not args.output_wav:
+            parser.error("text and --output-wav are required unless --jobs or --socket is given")
+    if not args.connect:
+        for flag in ("--matcha-acoustic-model", "--matcha-vocoder", "--matcha-tokens"):
+            if not getattr(args, flag[2:].replace("-", "_")):
+                parser.error(f"{flag} is required")
+    return args
 
-def main() -> None:
-    args = _parse_args()
 
+def _build_tts(args: argparse.Namespace) -> sherpa_onnx.OfflineTts:
     _require_path(args.matcha_acoustic_model, "--matcha-acoustic-model")
     _require_path(args.matcha_vocoder, "--matcha-vocoder")
     _require_path(args.matcha_tokens, "--matcha-tokens")
@@ -102,15 +148,20 @@ def main() -> None:
     if hasattr(config, "validate") and not config.validate():
         raise RuntimeError("Invalid sherpa-onnx TTS config")
 
-    tts = sherpa_onnx.OfflineTts(config)
+    return sherpa_onnx.OfflineTts(config)
+
 
-    text = (args.text or "").strip()
+def _synthesize(tts: sherpa_onnx.OfflineTts, text: str, sid: int, speed: float, output: str) -> dict:
+    """Synthesize `text` into the WAV file `output`; returns the timings in ms."""
+    text = (text or "").strip()
     if not text:
         raise ValueError("text is empty")
 
-    audio = tts.generate(text=text, sid=args.sid, speed=args.speed)
+    start = time.perf_counter()
+    audio = tts.generate(text=text, sid=sid, speed=speed)
+    synthesized = time.perf_counter()
 
-    out_path = Path(args.output_wav)
+    out_path = Path(output)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Write WAV
@@ -118,7 +169,229 @@ def main() -> None:
     sf.write(buf, audio.samples, audio.sample_rate, format="WAV")
     out_path.write_bytes(buf.getvalue())
 
-    print(f"Wrote {out_path}")
+    audio_seconds = len(audio.samples) / audio.sample_rate
+    synth_ms = (synthesized - start) * 1000.0
+    return {
+        "audio_seconds": round(audio_seconds, 3),
+        "synth_ms": round(synth_ms, 1),
+        "write_ms": round((time.perf_counter() - synthesized) * 1000.0, 1),
+        "rtf": round(synth_ms / 1000.0 / audio_seconds, 4) if audio_seconds else None,
+    }
+
+
+class _Engines:
+    """Loaded engines; each job checks one out, so --parallel jobs run at once."""
+
+    def __init__(self, engines: list[sherpa_onnx.OfflineTts]) -> None:
+        self._idle: queue.Queue[sherpa_onnx.OfflineTts] = queue.Queue()
+        for engine in engines:
+            self._idle.put(engine)
+        self.size = len(engines)
+
+    @contextmanager
+    def checkout(self) -> Iterator[sherpa_onnx.OfflineTts]:
+        engine = self._idle.get()
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+
+def _run_job(engines: _Engines, line: str, line_no: int, defaults: argparse.Namespace, received: float) -> dict:
+    result: dict = {"id": line_no}
+    try:
+        job = json.loads(line)
+        if not isinstance(job, dict):
+            raise ValueError("job must be a JSON object")
+        result["id"] = job.get("id", line_no)
+        output = job.get("output")
+        if not output:
+            raise ValueError("job has no output path")
+        result["output"] = output
+        with engines.checkout() as tts:
+            started = time.perf_counter()
+            timings = _synthesize(
+                tts,
+                job.get("text", ""),
+                int(job.get("sid", defaults.sid)),
+                float(job.get("speed", defaults.speed)),
+                output,
+            )
+        result.update(status="ok", queue_ms=round((started - received) * 1000.0, 1), **timings)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    return result
+
+
+def _run_jobs(
+    engines: _Engines, lines: Iterable[str], defaults: argparse.Namespace, emit: Callable[[dict], None]
+) -> tuple[int, int]:
+    """Run JSONL jobs `engines.size` at a time, calling `emit` with each result as it finishes.
+
+    Lines are read only as fast as slots free up, so a long or endless
+    input is never buffered in memory. Returns (ok, failed).
+
+    If `emit` fails with an OSError (the reader went away), no further job
+    is started and the error is re-raised once running jobs have finished.
+    """
+    counts = {"ok": 0, "error": 0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(engines.size * 2)
+    emit_error: list[OSError] = []
+
+    def _one(line: str, line_no: int, received: float) -> None:
+        try:
+            if emit_error:
+                return
+            result = _run_job(engines, line, line_no, defaults, received)
+            with lock:
+                counts[result["status"]] += 1
+                if not emit_error:
+                    emit(result)
+        except OSError as e:
+            emit_error.append(e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=engines.size, thread_name_prefix="tts-job") as pool:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            slots.acquire()
+            if emit_error:
+                slots.release()
+                break
+            pool.submit(_one, line, line_no, time.perf_counter())
+    if emit_error:
+        raise emit_error[0]
+    return counts["ok"], counts["error"]
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        def _emit(result: dict) -> None:
+            self.wfile.write((json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        lines = (raw.decode("utf-8") for raw in self.rfile)
+        try:
+            _run_jobs(self.server.engines, lines, self.server.defaults, _emit)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class _JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, engines: _Engines, defaults: argparse.Namespace) -> None:
+        self.engines = engines
+        self.defaults = defaults
+        super().__init__(path, _JobHandler)
+
+
+def _serve(path: str, engines: _Engines, defaults: argparse.Namespace) -> None:
+    if os.path.exists(path):
+        # A socket left behind by a previous run; refuse to take over a live one.
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise RuntimeError(f"Another daemon is listening on {path}")
+        finally:
+            probe.close()
+    server = _JobServer(path, engines, defaults)
+    os.chmod(path, 0o600)
+    _log(f"Listening on {path} ({engines.size} engine(s)); Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+def _connect(path: str, lines: Iterable[str]) -> int:
+    """Send jobs to a running daemon and print its results; returns the number of failed jobs."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+
+    def _send() -> None:
+        with sock.makefile("wb") as out:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    job = json.loads(line)
+                except ValueError:
+                    job = None
+                # The daemon resolves paths against its own working directory.
+                if isinstance(job, dict) and job.get("output"):
+                    line = json.dumps({**job, "output": os.path.abspath(job["output"])}, ensure_ascii=False)
+                out.write((line.rstrip("\n") + "\n").encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=_send, daemon=True)
+    sender.start()
+    failed = 0
+    with sock.makefile("rb") as results:
+        for raw in results:
+            line = raw.decode("utf-8")
+            failed += json.loads(line).get("status") != "ok"
+            sys.stdout.write(line)
+            sys.stdout.flush()
+    sender.join()
+    sock.close()
+    return failed
+
+
+def _log(message: str) -> None:
+    # Progress goes to stderr; stdout carries only the JSONL results.
+    print(message, file=sys.stderr, flush=True)
+
+
+def _job_lines(args: argparse.Namespace) -> Iterable[str]:
+    if args.jobs == "-":
+        return sys.stdin
+    if args.jobs:
+        return Path(args.jobs).open(encoding="utf-8")
+    return [json.dumps({"text": args.text, "output": args.output_wav, "sid": args.sid, "speed": args.speed})]
+
+
+def main() -> None:
+    args = _parse_args()
+
+    if args.connect:
+        sys.exit(1 if _connect(args.connect, _job_lines(args)) else 0)
+
+    if not args.jobs and not args.socket:
+        tts = _build_tts(args)
+        _synthesize(tts, args.text, args.sid, args.speed, args.output_wav)
+        print(f"Wrote {args.output_wav}")
+        return
+
+    start = time.perf_counter()
+    engines = _Engines([_build_tts(args) for _ in range(max(1, args.parallel))])
+    _log(f"Loaded {engines.size} engine(s) in {time.perf_counter() - start:.2f}s")
+
+    if args.socket:
+        _serve(args.socket, engines, args)
+        return
+
+    def _emit(result: dict) -> None:
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    start = time.perf_counter()
+    try:
+        ok, failed = _run_jobs(engines, _job_lines(args), args, _emit)
+    except BrokenPipeError:
+        _log("Output closed; remaining jobs skipped")
+        sys.exit(1)
+    _log(f"{ok} ok, {failed} failed in {time.perf_counter() - start:.2f}s")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
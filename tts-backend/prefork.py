@@ -0,0 +1,126 @@
+"""Pre-fork launcher: load the model once, then fork workers that share it.
+
+`uvicorn server:app --workers N` starts N fresh interpreters, and each one
+reads the acoustic model, vocoder and lexicon into its own heap. Here the
+parent builds the default engine first and then forks; the weights are never
+written after loading, so the workers keep sharing those pages copy-on-write
+and a second worker costs little more than its activations.
+
+    TTS_WORKERS=4 python prefork.py --port 8000
+
+ONNX Runtime thread pools do not survive `fork()`, so engines are built with
+TTS_NUM_THREADS=1 and parallelism comes from the worker processes (and
+TTS_POOL_SIZE within each). Non-default models are still loaded lazily,
+privately per worker. Compare `memory.pss_bytes` in each worker's /health
+to see the shared share.
+
+Linux/macOS only (needs `os.fork`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("prefork")
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(app, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            _serve(app, sock, log_level)
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TTS_WORKERS", "2")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    threads = os.environ.get("TTS_NUM_THREADS", "1")
+    if threads != "1":
+        logger.warning("TTS_NUM_THREADS=%s ignored: ORT thread pools do not survive fork, using 1", threads)
+    os.environ["TTS_NUM_THREADS"] = "1"
+    # Same for the per-session overrides of TTS_ENGINE_CONFIG: 0 masks them and leaves both
+    # sessions at TTS_NUM_THREADS, so no `ort_config` model copies are written per worker.
+    os.environ.update(TTS_ACOUSTIC_THREADS="0", TTS_VOCODER_THREADS="0", TTS_INTER_OP_THREADS="0")
+
+    import server
+
+    start = time.perf_counter()
+    server.preload()
+    logger.info("Default model loaded in %.2fs; forking %d workers", time.perf_counter() - start, args.workers)
+
+    sock = _bind(args.host, args.port)
+    # Keep the workers' collector from touching (and so copying) inherited objects.
+    gc.freeze()
+
+    children = {_spawn(server.app, sock, args.log_level) for _ in range(max(1, args.workers))}
+    stopping = False
+
+    def _stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            # Replace crashed workers; the model is still loaded in this process.
+            logger.warning("Worker %d exited (status %d); restarting", pid, status)
+            time.sleep(1)
+            children.add(_spawn(server.app, sock, args.log_level))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
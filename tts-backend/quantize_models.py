@@ -0,0 +1,67 @@
+"""Write dynamically quantized INT8 variants of the Matcha acoustic model and vocoder.
+
+Model paths come from the same SHERPA_MATCHA_* env vars as the server. The
+variants are written as `<name>.int8.onnx` next to each model (or into
+--out-dir / TTS_QUANTIZED_DIR), where `TTS_QUANTIZE=all` picks them up:
+
+    pip install onnxruntime onnx
+    python quantize_models.py
+    python benchmark.py quantize --output quantize_report.json
+    TTS_QUANTIZE=all uvicorn server:app
+
+Only MatMul/Gemm are quantized by default; add `--op-types MatMul,Gemm,Conv`
+to try integer convolutions as well (often slower on CPU; measure first).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+
+from tts_adapter import parse_targets, quantized_model, sherpa_matcha_paths_from_env
+from tts_adapter.quantize import DEFAULT_OP_TYPES, int8_name
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default="all", help="all, acoustic or vocoder (comma-separated).")
+    parser.add_argument(
+        "--out-dir",
+        default=os.environ.get("TTS_QUANTIZED_DIR", ""),
+        help="Where to write the variants (default: next to each model).",
+    )
+    parser.add_argument(
+        "--op-types", default=",".join(DEFAULT_OP_TYPES), help="Comma-separated ONNX op types to quantize."
+    )
+    parser.add_argument(
+        "--per-channel", action="store_true", help="One scale per output channel (larger, often more accurate)."
+    )
+    parser.add_argument("--force", action="store_true", help="Rewrite variants that are already up to date.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    paths = sherpa_matcha_paths_from_env()
+    sources = {"acoustic": paths.acoustic_model, "vocoder": paths.vocoder}
+    op_types = tuple(t.strip() for t in args.op_types.split(",") if t.strip())
+    report = {}
+    for target in parse_targets(args.targets):
+        src = sources[target]
+        out_dir = args.out_dir or str(Path(src).parent)
+        if args.force:
+            Path(out_dir, int8_name(src)).unlink(missing_ok=True)
+        dst = quantized_model(src, out_dir, op_types=op_types, per_channel=args.per_channel)
+        report[target] = {
+            "source": src,
+            "output": dst,
+            "source_mb": round(os.path.getsize(src) / 2**20, 2),
+            "output_mb": round(os.path.getsize(dst) / 2**20, 2),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""Cache-affinity router in front of several `server:app` replicas.
+
+Every replica keeps its own synthesis cache, segment cache and warm engines,
+so behind a round-robin balancer the same prompt is synthesized once per
+replica. This router hashes each `/tts` and `/tts/stream` request's
+(text, sid, speed, model) onto a consistent-hash ring of replicas, so
+repeats of a prompt reach the replica that already has it cached; `format`
+is left out because the cached segments are shared by all formats.
+
+- A replica with `TTS_ROUTER_MAX_INFLIGHT` requests in flight from this
+  router spills new work to the least-loaded healthy replica.
+- Replicas are polled on `/health`; one that fails, answers non-200 or
+  reports `ready: false` is ejected (its keys move to the next replica on
+  the ring) until a later poll succeeds. A refused connection ejects it at
+  once and the request is retried on the next replica; so is a 503.
+- `/tts/prefetch` texts are split by owner, so the audio is rendered on the
+  replica the later `/tts` call goes to.
+
+    TTS_ENGINE=stub uvicorn server:app --port 8001 &
+    TTS_ENGINE=stub uvicorn server:app --port 8002 &
+    TTS_REPLICAS=http://127.0.0.1:8001,http://127.0.0.1:8002 uvicorn router:app --port 8000
+
+Batch jobs and `/tts/ws` keep per-replica state; send those to a replica
+directly.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from generate_fixed_audio import SCRIPTS
+from tts_adapter import step_texts
+
+logger = logging.getLogger(__name__)
+
+# Not forwarded in either direction (RFC 9110 §7.6.1); content-length is recomputed by httpx.
+_HOP_HEADERS = frozenset(
+    {
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+        "host",
+        "content-length",
+    }
+)
+
+
+# How often a waiting request checks whether its client is still there (as in server.py).
+_DISCONNECT_POLL_SECONDS = float(os.environ.get("TTS_DISCONNECT_POLL_MS", "100")) / 1000.0
+# nginx's "client closed request".
+_CLIENT_CLOSED = 499
+
+
+async def _unless_disconnected(request: Request, awaitable):
+    """Await `awaitable`, cancelling it if the client disconnects first; see server.py."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_DISCONNECT_POLL_SECONDS)
+            if done:
+                return True, task.result()
+            if await request.is_disconnected():
+                return False, None
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def route_key(text: str, sid: int = 0, speed: float = 1.0, model: str | None = None) -> str:
+    return "\x1f".join((text.strip(), str(int(sid)), repr(float(speed)), model or ""))
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with `vnodes` points per node.
+
+    Removing a node only moves the keys it owned, which is what keeps the
+    other replicas' caches useful while one is ejected.
+    """
+
+    def __init__(self, nodes: list[str], vnodes: int = 64) -> None:
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(max(1, vnodes)))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [n for _, n in points]
+        self._count = len(set(nodes))
+
+    def walk(self, key: str) -> list[str]:
+        """Distinct nodes in ring order, starting with the owner of `key`."""
+        if not self._nodes:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key))
+        seen: list[str] = []
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in seen:
+                seen.append(node)
+                if len(seen) == self._count:
+                    break
+        return seen
+
+
+@dataclass
+class Replica:
+    url: str
+    healthy: bool = True
+    inflight: int = 0
+    routed: int = 0
+    spilled: int = 0
+    failures: int = 0
+    error: str | None = None
+    checked: float | None = None
+
+    def eject(self, reason: str) -> None:
+        if self.healthy:
+            logger.warning("Ejecting replica %s: %s", self.url, reason)
+        self.healthy = False
+        self.error = reason
+        self.failures += 1
+
+    def admit(self) -> None:
+        if not self.healthy:
+            logger.info("Replica %s is healthy again", self.url)
+        self.healthy = True
+        self.error = None
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "routed": self.routed,
+            "spilled": self.spilled,
+            "failures": self.failures,
+            "error": self.error,
+            "checked_ago": None if self.checked is None else round(time.monotonic() - self.checked, 1),
+        }
+
+
+class Router:
+    """Pick a replica per key and forward requests to it (see the module docstring)."""
+
+    def __init__(
+        self,
+        urls: list[str],
+        *,
+        vnodes: int = 64,
+        max_inflight: int = 4,
+        health_interval: float = 2.0,
+        health_timeout: float = 1.0,
+        timeout: float = 300.0,
+    ) -> None:
+        urls = list(dict.fromkeys(u.strip().rstrip("/") for u in urls if u.strip()))
+        self.replicas = {url: Replica(url) for url in urls}
+        self.ring = HashRing(urls, vnodes)
+        self.max_inflight = max(1, int(max_inflight))
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(timeout, connect=min(timeout, 2.0)))
+        # key -> [replica, requests for it in flight there]; see candidates().
+        self._active: dict[str, list] = {}
+        self._health_task: asyncio.Task | None = None
+
+    def candidates(self, key: str) -> list[Replica]:
+        """Healthy replicas to try, best first.
+
+        The ring owner of `key`, unless it is at `max_inflight`; then the
+        least-loaded replica goes first (ties keep ring order, so the spill
+        for a key is stable too). A key already in flight stays where it
+        is, since the replica joins identical requests into one synthesis.
+        The rest follow in ring order as retries.
+        """
+        order = [self.replicas[url] for url in self.ring.walk(key) if self.replicas[url].healthy]
+        active = self._active.get(key)
+        if active is not None and active[0] in order:
+            order.remove(active[0])
+            order.insert(0, active[0])
+        elif order and order[0].inflight >= self.max_inflight:
+            spill = min(order, key=lambda r: r.inflight)
+            if spill is not order[0]:
+                order.remove(spill)
+                order.insert(0, spill)
+                spill.spilled += 1
+        return order
+
+    def owner(self, key: str) -> Replica | None:
+        for url in self.ring.walk(key):
+            if self.replicas[url].healthy:
+                return self.replicas[url]
+        return None
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            response = await self._client.get(f"{replica.url}/health", timeout=self.health_timeout)
+            if response.status_code != 200:
+                replica.eject(f"/health returned {response.status_code}")
+            elif not response.json().get("ready"):
+                replica.eject(response.json().get("error") or "engine not ready")
+            else:
+                replica.admit()
+        except (httpx.HTTPError, ValueError) as e:
+            replica.eject(f"/health failed: {type(e).__name__}: {e}")
+        replica.checked = time.monotonic()
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(r) for r in self.replicas.values()))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_all()
+            except Exception:
+                logger.exception("Replica health check failed")
+
+    async def start(self) -> None:
+        await self.check_all()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+        await self._client.aclose()
+
+    def _claim(self, replica: Replica, key: str) -> None:
+        replica.inflight += 1
+        active = self._active.get(key)
+        if active is None or active[0] is not replica:
+            active = self._active[key] = [replica, 0]
+        active[1] += 1
+
+    def _unclaim(self, replica: Replica, key: str) -> None:
+        replica.inflight -= 1
+        active = self._active.get(key)
+        if active is not None and active[0] is replica:
+            active[1] -= 1
+            if active[1] <= 0:
+                del self._active[key]
+
+    async def forward(self, request: Request, path: str, key: str, body: bytes) -> Response:
+        """Send the request to the first candidate that accepts it and stream the answer back."""
+        order = self.candidates(key)
+        if not order:
+            raise HTTPException(status_code=503, detail="No healthy TTS replica")
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS]
+        if request.client is not None:
+            headers.append(("x-forwarded-for", request.client.host))
+        query = request.url.query
+        for i, replica in enumerate(order):
+            upstream = self._client.build_request(
+                request.method, f"{replica.url}{path}{'?' + query if query else ''}", headers=headers, content=body
+            )
+            self._claim(replica, key)
+            try:
+                # Dropping the upstream connection makes the replica cancel the synthesis too.
+                completed, response = await _unless_disconnected(request, self._client.send(upstream, stream=True))
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                self._unclaim(replica, key)
+                replica.eject(f"{type(e).__name__}: {e}")
+                continue
+            except httpx.HTTPError as e:
+                self._unclaim(replica, key)
+                raise HTTPException(status_code=502, detail=f"{replica.url}: {type(e).__name__}: {e}")
+            except BaseException:
+                self._unclaim(replica, key)
+                raise
+            if not completed:
+                self._unclaim(replica, key)
+                return Response(status_code=_CLIENT_CLOSED)
+            if response.status_code == 503 and i < len(order) - 1:
+                # Engine not ready or pool full; the next replica may have room.
+                await response.aclose()
+                self._unclaim(replica, key)
+                continue
+            replica.routed += 1
+            return self._relay(replica, response, key)
+        raise HTTPException(status_code=502, detail="No TTS replica reachable")
+
+    def _relay(self, replica: Replica, response: httpx.Response, key: str) -> StreamingResponse:
+        released = False
+
+        async def release() -> None:
+            # Runs from the body iterator or the background task, whichever
+            # gets there first (a client disconnect can skip either one).
+            nonlocal released
+            if not released:
+                released = True
+                self._unclaim(replica, key)
+                await response.aclose()
+
+        async def body():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await release()
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+        headers["X-TTS-Replica"] = replica.url
+        return StreamingResponse(
+            body(), status_code=response.status_code, headers=headers, background=BackgroundTask(release)
+        )
+
+    async def prefetch(self, payload: dict) -> JSONResponse:
+        """Split a /tts/prefetch request by owner so each text is rendered where /tts will look for it."""
+        texts = [t.strip() for t in payload.get("texts") or [] if isinstance(t, str) and t.strip()]
+        if payload.get("step"):
+            try:
+                texts += step_texts(payload["step"], SCRIPTS, payload.get("context") or {})
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        sid, speed, model = payload.get("sid", 0), payload.get("speed", 1.0), payload.get("model")
+        try:
+            keys = [route_key(text, sid, speed, model) for text in texts]
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=422, detail="sid and speed must be numbers")
+
+        groups: dict[str, list[str]] = {}
+        for text, key in zip(texts, keys):
+            replica = self.owner(key)
+            if replica is None:
+                raise HTTPException(status_code=503, detail="No healthy TTS replica")
+            groups.setdefault(replica.url, []).append(text)
+
+        fields = {k: v for k, v in payload.items() if k not in ("step", "context", "texts")}
+        posts = [self._client.post(f"{url}/tts/prefetch", json={**fields, "texts": g}) for url, g in groups.items()]
+        responses = await asyncio.gather(*posts, return_exceptions=True)
+        result = {"queued": 0, "texts": [], "replicas": {}}
+        for url, response in zip(groups, responses):
+            if isinstance(response, Exception):
+                result["replicas"][url] = f"{type(response).__name__}: {response}"
+            elif response.status_code != 202:
+                if response.status_code == 422:
+                    return JSONResponse(response.json(), status_code=422)
+                result["replicas"][url] = f"HTTP {response.status_code}"
+            else:
+                data = response.json()
+                result["queued"] += data.get("queued", 0)
+                result["texts"] += data.get("texts", [])
+                result["replicas"][url] = len(data.get("texts", []))
+        return JSONResponse(result, status_code=202)
+
+    def stats(self) -> dict:
+        replicas = [r.stats() for r in self.replicas.values()]
+        return {
+            "status": "ok",
+            "router": True,
+            "healthy": sum(r["healthy"] for r in replicas),
+            "max_inflight": self.max_inflight,
+            "replicas": replicas,
+        }
+
+
+def _key_from_request(request: Request, body: bytes) -> str:
+    """Same precedence as the server: query parameters win over the JSON body when `text` is in the query."""
+    params = request.query_params
+    if "text" not in params and body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            params = payload
+    try:
+        return route_key(
+            str(params.get("text") or ""), params.get("sid", 0), params.get("speed", 1.0), params.get("model")
+        )
+    except (TypeError, ValueError):
+        # Malformed sid/speed: any replica will answer the 422.
+        return str(params.get("text") or "")
+
+
+app = FastAPI(title="EcoAction TTS Router", description="Cache-affinity router for TTS replicas")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+_router: Router | None = None
+
+
+@app.on_event("startup")
+async def _startup() -> None:
+    global _router
+    urls = [u for u in os.environ.get("TTS_REPLICAS", "").split(",") if u.strip()]
+    if not urls:
+        raise RuntimeError("TTS_REPLICAS is empty; set it to comma-separated replica URLs")
+    _router = Router(
+        urls,
+        vnodes=int(os.environ.get("TTS_ROUTER_VNODES", "64")),
+        max_inflight=int(os.environ.get("TTS_ROUTER_MAX_INFLIGHT", "4")),
+        health_interval=float(os.environ.get("TTS_ROUTER_HEALTH_INTERVAL", "2")),
+        health_timeout=float(os.environ.get("TTS_ROUTER_HEALTH_TIMEOUT", "1")),
+        timeout=float(os.environ.get("TTS_ROUTER_TIMEOUT", "300")),
+    )
+    await _router.start()
+    logger.info("Routing to %d replica(s), %d healthy", len(urls), _router.stats()["healthy"])
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    if _router is not None:
+        await _router.stop()
+
+
+@app.get("/health")
+def health():
+    return _router.stats()
+
+
+@app.get("/ready")
+def ready_api():
+    stats = _router.stats()
+    status = 200 if stats["healthy"] else 503
+    return JSONResponse({"ready": stats["healthy"] > 0, "healthy": stats["healthy"]}, status_code=status)
+
+
+@app.api_route("/tts", methods=["GET", "POST"])
+async def tts_api(request: Request):
+    body = await request.body()
+    return await _router.forward(request, "/tts", _key_from_request(request, body), body)
+
+
+@app.post("/tts/stream")
+async def tts_stream_api(request: Request):
+    body = await request.body()
+    return await _router.forward(request, "/tts/stream", _key_from_request(request, body), body)
+
+
+@app.post("/tts/prefetch", status_code=202)
+async def tts_prefetch_api(request: Request):
+    try:
+        payload = json.loads(await request.body() or b"{}")
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Body must be JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=422, detail="Body must be a JSON object")
+    return await _router.prefetch(payload)
@@ -1,17 +1,52 @@
 from __future__ import annotations
 
-import io
+import asyncio
+import json
 import logging
+import os
+import re
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-from tts_adapter import create_tts_engine
+from generate_fixed_audio import SCRIPTS
+from tts_adapter import (
+    BaseTTS,
+    BatchItem,
+    BatchJob,
+    JobStore,
+    MicroBatchScheduler,
+    ModelRegistry,
+    PoolBusyError,
+    Prefetcher,
+    PrefetchItem,
+    PromptBank,
+    PromptEntry,
+    TooManyJobsError,
+    cancel,
+    create_model_registry,
+    create_scheduler,
+    memory,
+    metrics,
+    priority,
+    step_texts,
+    warm_up,
+    warmup_speeds_from_env,
+)
+from tts_adapter.audio import AUDIO_FORMATS, media_type, pcm16, wav_header
+from tts_adapter.jobs import entry_name, zip_bytes, zip_stream
 
 logger = logging.getLogger(__name__)
 
+# Reference point for the cold-start metric (import of the app ~ process start).
+_BOOT = time.perf_counter()
+
 app = FastAPI(title="EcoAction Offline TTS", description="Offline TTS via Sherpa-ONNX MatchaTTS")
 
 app.add_middleware(
@@ -23,27 +58,190 @@ app.add_middleware(
 )
 
 
+class _TrackRequests:
+    """Request count/latency/in-flight metrics for `/tts*`.
+
+    Plain ASGI rather than `@app.middleware("http")`: the latter wraps
+    `receive`, which hides client disconnects from the handlers below.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/tts"):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def _send(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            # Label by route template so /tts/batch/{job_id} stays one series.
+            route = scope.get("route")
+            endpoint = getattr(route, "path", scope["path"])
+            # Covers the whole response, including streamed bodies.
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            metrics.REQUESTS_TOTAL.inc(endpoint, str(status))
+            metrics.IN_FLIGHT.dec()
+
+
+app.add_middleware(_TrackRequests)
+
+
+def _timing_headers(timings: dict[str, float]) -> dict[str, str]:
+    return {"Server-Timing": metrics.server_timing(timings), "Timing-Allow-Origin": "*"}
+
+
 class TTSBody(BaseModel):
     text: str
     sid: int = 0
     speed: float = 1.0
+    format: str = "wav"
+    model: str | None = None
+
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls `on_close` once sending ends, however it ends."""
+
+    def __init__(self, content, *, on_close, **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._on_close()
+
+
+class AudioResponse(Response):
+    """Send the encoder's buffer (bytes or memoryview) as the body without copying it."""
+
+    def render(self, content) -> bytes | memoryview:
+        return content
 
 
 _tts_engine = None
+_registry: ModelRegistry | None = None
+_scheduler: MicroBatchScheduler | None = None
 _startup_error: str | None = None
+_prompt_bank = PromptBank()
+_ready = threading.Event()
+
+_PROMPT_CACHE_CONTROL = os.environ.get("TTS_PROMPT_BANK_CACHE_CONTROL", "public, max-age=86400")
+
+_BATCH_MAX_ITEMS = int(os.environ.get("TTS_BATCH_MAX_ITEMS", "500"))
+_jobs = JobStore(
+    ttl=float(os.environ.get("TTS_BATCH_JOB_TTL", "3600")),
+    max_jobs=int(os.environ.get("TTS_BATCH_MAX_JOBS", "100")),
+)
+
+
+def preload() -> None:
+    """Build the model registry and the default model in this process, before any worker forks.
+
+    Used by `prefork.py`: forked workers inherit the loaded engine and share
+    its weight pages copy-on-write instead of each loading its own copy.
+    """
+    global _registry
+    _registry = create_model_registry()
+    _registry.preload()
+
+
+def _prefetch_one(item: PrefetchItem) -> None:
+    engine = _registry.acquire(item.model).result()
+    try:
+        # Stores the result under the same cache key a later /tts hits.
+        with priority.scope(priority.PREFETCH):
+            engine.synthesize(item.text, sid=item.sid, speed=item.speed, format=item.format)
+    finally:
+        _registry.release(item.model)
+
+
+def _interactive_busy() -> bool:
+    if _scheduler is None or _tts_engine is None:
+        return True
+    pool = _tts_engine.stats()["pool"]["classes"][priority.INTERACTIVE]
+    return _scheduler.pending(priority.INTERACTIVE) > 0 or pool["in_use"] > 0 or pool["waiting"] > 0
+
+
+_PREFETCH_MAX_TEXTS = 16
+_prefetcher = Prefetcher(
+    _prefetch_one,
+    busy=_interactive_busy,
+    max_queue=int(os.environ.get("TTS_PREFETCH_MAX_QUEUE", "64")),
+    max_age=float(os.environ.get("TTS_PREFETCH_MAX_AGE", "60")),
+)
 
 
 @app.on_event("startup")
 def _startup() -> None:
-    global _tts_engine, _startup_error
+    global _tts_engine, _registry, _scheduler, _startup_error
+
+    bank_dir = os.environ.get("TTS_PROMPT_BANK_DIR", "")
+    if bank_dir:
+        try:
+            loaded = _prompt_bank.load_dir(bank_dir, SCRIPTS)
+            logger.info("Prompt bank loaded %d clips from %s", loaded, bank_dir)
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.exception("Prompt bank load failed")
+
     try:
-        _tts_engine = create_tts_engine()
+        if _registry is None:
+            _registry = create_model_registry()
+        # The default model loads up front (and stays pinned); others on first use.
+        _tts_engine = _registry.acquire().result()
+        _registry.release()
+        _scheduler = create_scheduler(_tts_engine)
         _startup_error = None
         logger.info("TTS engine initialized")
     except Exception as e:
         _tts_engine = None
+        _registry = None
+        _scheduler = None
         _startup_error = str(e)
         logger.exception("TTS engine init failed")
+        return
+
+    # Warm-up (and optional prompt rendering) run in the background so the
+    # app is already listening; /ready turns green once warm-up is done.
+    def _warm() -> None:
+        if os.environ.get("TTS_WARMUP", "1") == "1":
+            try:
+                metrics.WARMUP_SECONDS.set(warm_up(_tts_engine, speeds=warmup_speeds_from_env()))
+            except Exception:
+                logger.exception("TTS warm-up failed")
+        # Model loading and warm-up leave large freed buffers behind.
+        memory.trim()
+        metrics.COLD_START_SECONDS.set(time.perf_counter() - _BOOT)
+        _ready.set()
+
+        if os.environ.get("TTS_PROMPT_BANK_RENDER", "0") == "1":
+            try:
+                with priority.scope(priority.BATCH):
+                    rendered = _prompt_bank.render_missing(_tts_engine, SCRIPTS)
+                logger.info("Prompt bank rendered %d missing clips", rendered)
+            except Exception:
+                logger.exception("Prompt bank render failed")
+
+    threading.Thread(target=_warm, name="tts-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    _prefetcher.stop()
+    if _scheduler is not None:
+        await _scheduler.stop()
 
 
 @app.get("/health")
@@ -52,35 +250,781 @@ def health():
         "status": "ok",
         "engine": "sherpa-onnx(matcha)",
         "ready": _tts_engine is not None,
+        "warm": _ready.is_set(),
         "error": _startup_error,
+        **(_tts_engine.stats() if _tts_engine is not None else {}),
+        **(_scheduler.stats() if _scheduler is not None else {}),
+        **(_registry.stats() if _registry is not None else {}),
+        **_prompt_bank.stats(),
+        **_jobs.stats(),
+        **_prefetcher.stats(),
+        "memory": memory.observe(),
     }
 
 
-@app.post("/tts")
-def tts_api(
-    text: str | None = Query(default=None),
-    sid: int = Query(default=0),
-    speed: float = Query(default=1.0),
-    body: TTSBody | None = None,
-):
-    if _tts_engine is None:
-        raise HTTPException(status_code=503, detail=_startup_error or "TTS engine not ready")
-
+def _resolve_request(
+    text: str | None, sid: int, speed: float, format: str, model: str | None, body: TTSBody | None
+) -> tuple[str, int, float, str, str | None]:
+    """Query parameters win over the JSON body (kept for older clients)."""
     effective_text = (text if text is not None else (body.text if body else None))
     effective_sid = sid if text is not None else ((body.sid if body else sid))
     effective_speed = speed if text is not None else ((body.speed if body else speed))
+    effective_format = format if text is not None else ((body.format if body else format))
+    effective_model = model if text is not None else ((body.model if body else model))
 
     if effective_text is None:
         raise HTTPException(status_code=422, detail="Missing text")
+    if effective_format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unsupported format: {effective_format} (choose from {', '.join(AUDIO_FORMATS)})",
+        )
+
+    return effective_text, effective_sid, effective_speed, effective_format, effective_model
+
+
+def _require_engine() -> None:
+    if _tts_engine is None:
+        raise HTTPException(status_code=503, detail=_startup_error or "TTS engine not ready")
+
+
+def _is_default_model(model: str | None) -> bool:
+    return model is None or (_registry is not None and model == _registry.default)
+
+
+async def _acquire_engine(request: Request, model: str | None) -> BaseTTS | None:
+    """Engine for `model` (None = default), waiting while it loads in the background.
 
+    Returns None if the client disconnected meanwhile. Otherwise the caller
+    must call `_registry.release(model)` once it is done with the engine.
+    """
     try:
-        audio_bytes = _tts_engine.synthesize(effective_text, sid=effective_sid, speed=effective_speed)
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        future = _registry.acquire(model)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
+    try:
+        if future.done():
+            return future.result()
+        # shield: a disconnect must not cancel a load other requests share.
+        completed, engine = await _unless_disconnected(request, asyncio.shield(asyncio.wrap_future(future)))
     except Exception as e:
-        logger.exception("TTS synthesis failed")
-        raise HTTPException(status_code=500, detail=f"TTS synthesis failed: {e}")
+        _registry.release(model)
+        raise _synthesis_error(e)
+    if not completed:
+        _registry.release(model)
+        return None
+    return engine
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    """If-None-Match: `*` or a comma-separated list of ETags, compared weakly (RFC 9110 §13.1.2)."""
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (t.removeprefix("W/") for t in tags)
+
+
+def _prompt_response(request: Request, entry: PromptEntry) -> Response:
+    """Serve a prompt-bank clip with a strong ETag, Cache-Control and single-range support."""
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": _PROMPT_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    data = entry.data
+    size = len(data)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    m = _RANGE_RE.match(range_header.strip()) if range_header else None
+    if m and (if_range is None or if_range == entry.etag):
+        first, last = m.groups()
+        # `bytes=5-3` and `bytes=-` are invalid and ignored (full 200, RFC 9110 §14.1.1);
+        # only a valid range that lies past the end is unsatisfiable.
+        if first and (not last or int(last) >= int(first)):
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        elif not first and last:
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start = end = None
+        if start is not None:
+            if start >= size or start > end:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return AudioResponse(data[start : end + 1], status_code=206, media_type=entry.media_type, headers=headers)
+
+    return AudioResponse(data, media_type=entry.media_type, headers=headers)
+
+
+# How often a waiting handler checks whether its client is still there.
+_DISCONNECT_POLL_SECONDS = float(os.environ.get("TTS_DISCONNECT_POLL_MS", "100")) / 1000.0
+# nginx's "client closed request"; only ever seen in logs and metrics.
+_CLIENT_CLOSED = 499
+
+
+async def _unless_disconnected(request: Request, awaitable):
+    """Await `awaitable`, cancelling it if the client disconnects first.
+
+    Returns `(True, result)` normally and `(False, None)` after a disconnect.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_DISCONNECT_POLL_SECONDS)
+            if done:
+                return True, task.result()
+            if await request.is_disconnected():
+                return False, None
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _synthesis_error(e: Exception) -> HTTPException:
+    if isinstance(e, PoolBusyError):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, FileNotFoundError):
+        return HTTPException(status_code=500, detail=str(e))
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=422, detail=str(e))
+    logger.exception("TTS synthesis failed")
+    return HTTPException(status_code=500, detail=f"TTS synthesis failed: {e}")
+
+
+@app.get("/ready")
+def ready_api():
+    """Readiness probe: 200 only after the engine is loaded and warmed up."""
+    if _tts_engine is None or not _ready.is_set():
+        detail = _startup_error or ("warming up" if _tts_engine is not None else "TTS engine not ready")
+        return JSONResponse({"ready": False, "detail": detail}, status_code=503)
+    return {"ready": True}
+
+
+@app.get("/metrics")
+def metrics_api():
+    memory.observe()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/prompts")
+def prompts_api():
+    return [
+        {"name": e.name, "text": e.text, "sid": e.sid, "speed": e.speed, "bytes": len(e.data), "etag": e.etag}
+        for e in _prompt_bank.entries()
+    ]
+
+
+@app.get("/prompts/{name}")
+def prompt_api(name: str, request: Request):
+    entry = _prompt_bank.get(name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown prompt: {name}")
+    return _prompt_response(request, entry)
+
+
+@app.api_route("/tts", methods=["GET", "POST"])
+async def tts_api(
+    request: Request,
+    text: str | None = Query(default=None),
+    sid: int = Query(default=0),
+    speed: float = Query(default=1.0),
+    format: str = Query(default="wav"),
+    model: str | None = Query(default=None),
+    body: TTSBody | None = None,
+):
+    """Synthesize the whole text; `format` is wav (PCM16), pcm (raw s16le), flac, ogg or opus.
+
+    `model` selects a registered model id (see /health); omitted means the
+    default model. Text matching a prompt-bank clip is answered from memory
+    with HTTP caching headers; GET is accepted so such URLs can be cached by
+    browsers and CDNs or used directly as an `<audio>` source.
+    """
+    effective_text, effective_sid, effective_speed, effective_format, effective_model = _resolve_request(
+        text, sid, speed, format, model, body
+    )
+
+    if effective_format == "wav" and _is_default_model(effective_model):
+        entry = _prompt_bank.lookup(effective_text, sid=effective_sid, speed=effective_speed)
+        if entry is not None:
+            return _prompt_response(request, entry)
+
+    _require_engine()
+    engine = await _acquire_engine(request, effective_model)
+    if engine is None:
+        return Response(status_code=_CLIENT_CLOSED)
+
+    timings: dict[str, float] = {}
+    try:
+        completed, audio = await _unless_disconnected(
+            request,
+            _scheduler.submit(
+                effective_text,
+                sid=effective_sid,
+                speed=effective_speed,
+                format=effective_format,
+                timings=timings,
+                engine=engine,
+            ),
+        )
+    except Exception as e:
+        raise _synthesis_error(e)
+    finally:
+        _registry.release(effective_model)
+    if not completed:
+        # Nobody is listening; the scheduler drops the work if it had not started.
+        return Response(status_code=_CLIENT_CLOSED)
+
+    return AudioResponse(
+        audio,
+        media_type=media_type(effective_format, engine.sample_rate),
+        headers=_timing_headers(timings),
+    )
+
+
+@app.post("/tts/stream")
+async def tts_stream_api(
+    request: Request,
+    text: str | None = Query(default=None),
+    sid: int = Query(default=0),
+    speed: float = Query(default=1.0),
+    format: str = Query(default="wav"),
+    model: str | None = Query(default=None),
+    body: TTSBody | None = None,
+):
+    """Stream a WAV header followed by PCM frames, one sentence at a time.
+
+    `format=pcm` drops the header. The first sentence is synthesized before
+    the response starts so errors still map to proper status codes; later
+    failures can only end the stream. Sentences run on the synthesis
+    executor one at a time, and no further sentence is started once the
+    client has disconnected.
+    """
+    _require_engine()
+    effective_text, effective_sid, effective_speed, effective_format, effective_model = _resolve_request(
+        text, sid, speed, format, model, body
+    )
+    if effective_format not in ("wav", "pcm"):
+        raise HTTPException(status_code=422, detail="Streaming supports format=wav or format=pcm")
+
+    engine = await _acquire_engine(request, effective_model)
+    if engine is None:
+        return Response(status_code=_CLIENT_CLOSED)
+
+    loop = asyncio.get_running_loop()
+    token = cancel.CancelToken()
+    chunks = engine.synthesize_stream(effective_text, sid=effective_sid, speed=effective_speed)
+
+    def _next():
+        with cancel.scope(token):
+            return next(chunks, None)
+
+    def _first():
+        with metrics.collect() as timings:
+            return _next(), timings
+
+    try:
+        completed, result = await _unless_disconnected(request, loop.run_in_executor(_scheduler.executor, _first))
+    except Exception as e:
+        token.cancel()
+        _registry.release(effective_model)
+        raise _synthesis_error(e)
+    if not completed:
+        token.cancel()
+        _registry.release(effective_model)
+        metrics.CANCELLED.inc("/tts/stream")
+        return Response(status_code=_CLIENT_CLOSED)
+    first, timings = result
+    if first is None:
+        _registry.release(effective_model)
+        raise HTTPException(status_code=422, detail="text is empty")
+
+    finished = False
+    released = False
+
+    def _close() -> None:
+        # From the body generator or the response, whichever ends first: a
+        # client gone before the body starts never runs the generator at all.
+        nonlocal released
+        if released:
+            return
+        released = True
+        _registry.release(effective_model)
+        if not finished:
+            token.cancel()
+            metrics.CANCELLED.inc("/tts/stream")
+
+    async def _frames():
+        nonlocal finished
+        try:
+            header = wav_header(first.sample_rate) if effective_format == "wav" else b""
+            yield header + pcm16(first.samples)
+            while not await request.is_disconnected():
+                chunk = await loop.run_in_executor(_scheduler.executor, _next)
+                if chunk is None:
+                    finished = True
+                    break
+                yield pcm16(chunk.samples)
+        except cancel.SynthesisCancelled:
+            pass
+        except Exception:
+            logger.exception("TTS streaming failed mid-response")
+            finished = True
+        finally:
+            _close()
+
+    # Timings cover the first sentence only; the rest is produced after headers are sent.
+    return _ClosingStreamingResponse(
+        _frames(),
+        on_close=_close,
+        media_type=media_type(effective_format, first.sample_rate),
+        headers=_timing_headers(timings),
+    )
+
+
+# Binary frames on /tts/ws: utterance seq and chunk index (uint32 LE each), then PCM16 LE.
+_WS_FRAME = struct.Struct("<II")
+# Utterances a connection may have queued behind the one playing.
+_WS_MAX_QUEUED = int(os.environ.get("TTS_WS_MAX_QUEUED", "8"))
+
+
+@dataclass
+class _Utterance:
+    id: str
+    seq: int
+    text: str
+    sid: int
+    speed: float
+    model: str | None
+    # Unacknowledged chunks allowed in flight; 0 leaves flow control to TCP.
+    window: int
+    received: float = field(default_factory=time.perf_counter)
+    token: cancel.CancelToken = field(default_factory=cancel.CancelToken)
+    acked: int = -1
+    credit: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def cancel(self) -> None:
+        self.token.cancel()
+        self.credit.set()
+
+
+class _SpeechSocket:
+    """One `/tts/ws` connection: utterances are queued and spoken in order.
+
+    The reader task handles control messages while the writer synthesizes
+    one segment at a time and sends it before starting the next, so a slow
+    client stalls synthesis rather than piling up frames here; a non-zero
+    `window` additionally caps unacknowledged chunks.
+    """
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.ws = websocket
+        self.queue: asyncio.Queue[_Utterance] = asyncio.Queue()
+        self.utterances: dict[str, _Utterance] = {}
+        self._seq = 0
+
+    async def send(self, message: dict) -> None:
+        await self.ws.send_text(json.dumps(message, ensure_ascii=False))
+
+    async def serve(self) -> None:
+        writer = asyncio.create_task(self._write())
+        try:
+            while True:
+                raw = await self.ws.receive_text()
+                try:
+                    message = json.loads(raw)
+                    if not isinstance(message, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    await self.send({"type": "error", "status": 400, "detail": f"Bad message: {e}"})
+                    continue
+                try:
+                    await self._handle(message)
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    # One bad message must not end the connection and its queued utterances.
+                    logger.exception("Error handling /tts/ws message %r", message.get("type"))
+                    await self.send({"type": "error", "id": message.get("id"), "status": 500, "detail": str(e)})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for utterance in self.utterances.values():
+                utterance.cancel()
+            writer.cancel()
+            try:
+                await writer
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                pass
+
+    async def _handle(self, message: dict) -> None:
+        kind = message.get("type")
+        uid = str(message.get("id", ""))
+        if kind == "synthesize":
+            await self._enqueue(uid, message)
+        elif kind == "cancel":
+            utterance = self.utterances.get(uid)
+            if utterance is not None:
+                utterance.cancel()
+        elif kind == "ack":
+            try:
+                chunk = int(message.get("chunk", -1))
+            except (TypeError, ValueError) as e:
+                await self.send({"type": "error", "id": uid or None, "status": 422, "detail": f"Bad chunk: {e}"})
+                return
+            utterance = self.utterances.get(uid)
+            if utterance is not None:
+                utterance.acked = max(utterance.acked, chunk)
+                utterance.credit.set()
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        else:
+            await self.send(
+                {"type": "error", "id": uid or None, "status": 400, "detail": f"Unknown message type: {kind}"}
+            )
+
+    async def _enqueue(self, uid: str, message: dict) -> None:
+        def _reject(status: int, detail: str):
+            metrics.REQUESTS_TOTAL.inc("/tts/ws", str(status))
+            return self.send({"type": "error", "id": uid, "status": status, "detail": detail})
+
+        if not uid or uid in self.utterances:
+            return await _reject(400, "Each utterance needs an id that is not in use on this connection")
+        text = message.get("text")
+        model = message.get("model")
+        try:
+            sid = int(message.get("sid", 0))
+            speed = float(message.get("speed", 1.0))
+            window = max(0, int(message.get("window", 0)))
+        except (TypeError, ValueError) as e:
+            return await _reject(422, str(e))
+        if not isinstance(text, str) or not text.strip():
+            return await _reject(422, "text is empty")
+        if _tts_engine is None:
+            return await _reject(503, _startup_error or "TTS engine not ready")
+        if model is not None and model not in _registry:
+            return await _reject(422, f"Unknown model: {model}")
+        if self.queue.qsize() >= _WS_MAX_QUEUED:
+            return await _reject(503, f"At most {_WS_MAX_QUEUED} utterances may be queued per connection")
+
+        self._seq += 1
+        utterance = _Utterance(uid, self._seq, text, sid, speed, model, window)
+        self.utterances[uid] = utterance
+        self.queue.put_nowait(utterance)
+        await self.send({"type": "queued", "id": uid, "seq": utterance.seq})
+
+    async def _write(self) -> None:
+        while True:
+            utterance = await self.queue.get()
+            status = str(_CLIENT_CLOSED)
+            try:
+                status = await self._speak(utterance)
+            except asyncio.CancelledError:
+                # The connection closed mid-utterance.
+                metrics.CANCELLED.inc("/tts/ws")
+                raise
+            finally:
+                del self.utterances[utterance.id]
+                metrics.REQUESTS_TOTAL.inc("/tts/ws", status)
+                metrics.REQUEST_SECONDS.observe(time.perf_counter() - utterance.received, "/tts/ws")
+
+    async def _speak(self, u: _Utterance) -> str:
+        """Send one utterance (start, frames, end); returns its status for the metrics."""
+        if u.token.cancelled:
+            await self.send({"type": "cancelled", "id": u.id, "seq": u.seq, "chunks": 0})
+            metrics.CANCELLED.inc("/tts/ws")
+            return str(_CLIENT_CLOSED)
+
+        loop = asyncio.get_running_loop()
+        index = 0
+        future = _registry.acquire(u.model)
+        try:
+            # shield: a dropped connection must not cancel a load other requests share.
+            engine = await asyncio.shield(asyncio.wrap_future(future))
+            chunks = engine.synthesize_stream(u.text, sid=u.sid, speed=u.speed)
+
+            def _next():
+                with cancel.scope(u.token):
+                    return next(chunks, None)
+
+            await self.send(
+                {"type": "start", "id": u.id, "seq": u.seq, "sample_rate": engine.sample_rate, "format": "pcm_s16le"}
+            )
+            while True:
+                while u.window and index - u.acked > u.window and not u.token.cancelled:
+                    u.credit.clear()
+                    await u.credit.wait()
+                if u.token.cancelled:
+                    raise cancel.SynthesisCancelled()
+                chunk = await loop.run_in_executor(_scheduler.executor, _next)
+                if chunk is None:
+                    break
+                await self.ws.send_bytes(_WS_FRAME.pack(u.seq, index) + pcm16(chunk.samples))
+                if index == 0:
+                    metrics.FIRST_FRAME_SECONDS.observe(time.perf_counter() - u.received, "/tts/ws")
+                index += 1
+        except WebSocketDisconnect:
+            u.cancel()
+            raise
+        except cancel.SynthesisCancelled:
+            await self.send({"type": "cancelled", "id": u.id, "seq": u.seq, "chunks": index})
+            metrics.CANCELLED.inc("/tts/ws")
+            return str(_CLIENT_CLOSED)
+        except Exception as e:
+            error = _synthesis_error(e)
+            await self.send(
+                {"type": "error", "id": u.id, "seq": u.seq, "status": error.status_code, "detail": error.detail}
+            )
+            return str(error.status_code)
+        finally:
+            _registry.release(u.model)
+        if index == 0:
+            await self.send({"type": "error", "id": u.id, "seq": u.seq, "status": 422, "detail": "text is empty"})
+            return "422"
+        await self.send({"type": "end", "id": u.id, "seq": u.seq, "chunks": index})
+        return "200"
+
+
+@app.websocket("/tts/ws")
+async def tts_ws(websocket: WebSocket):
+    """Long-lived streaming TTS: JSON control messages in, PCM frames out.
+
+    Send `{"type": "synthesize", "id": ..., "text": ...}` (plus optional sid,
+    speed, model, window) per utterance; each is answered with `queued`,
+    `start`, binary frames as its segments are synthesized, then `end`,
+    `cancelled` or `error`. `{"type": "cancel", "id": ...}` stops an
+    utterance, `{"type": "ack", "id": ..., "chunk": n}` returns flow-control
+    credit. Closing the socket cancels everything it queued.
+    """
+    await websocket.accept()
+    metrics.WS_CONNECTIONS.inc()
+    try:
+        await _SpeechSocket(websocket).serve()
+    finally:
+        metrics.WS_CONNECTIONS.dec()
+
+
+class BatchItemBody(BaseModel):
+    id: str
+    text: str
+    sid: int = 0
+    speed: float = 1.0
+
+
+class BatchBody(BaseModel):
+    items: list[BatchItemBody]
+    format: str = "wav"
+    model: str | None = None
+    # "zip": stream a ZIP back on this request; "job": return a job id to poll.
+    mode: str = "zip"
+
+
+_ITEM_ID_RE = re.compile(r"^[\w.\-]{1,128}$")
+
+
+def _batch_job(body: BatchBody) -> BatchJob:
+    if not body.items:
+        raise HTTPException(status_code=422, detail="items is empty")
+    if len(body.items) > _BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {_BATCH_MAX_ITEMS} items per batch")
+    if body.format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=422, detail=f"Unsupported format: {body.format} (choose from {', '.join(AUDIO_FORMATS)})"
+        )
+    if body.model is not None and body.model not in _registry:
+        raise HTTPException(status_code=422, detail=f"Unknown model: {body.model}")
+    ids = [item.id for item in body.items]
+    bad = [i for i in ids if not _ITEM_ID_RE.match(i)]
+    if bad:
+        raise HTTPException(status_code=422, detail=f"Invalid item id: {bad[0]} (letters, digits, _ . - only)")
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=422, detail="Item ids must be unique")
+    return BatchJob(
+        (BatchItem(item.id, item.text, item.sid, item.speed) for item in body.items),
+        format=body.format,
+        model=body.model,
+    )
+
+
+def _batch_results(job: BatchJob, engine: BaseTTS):
+    """Run `job` on the scheduler, a few items per executor thread so the pool never idles."""
+
+    def _submit(item: BatchItem):
+        return _scheduler.submit(
+            item.text,
+            sid=item.sid,
+            speed=item.speed,
+            format=job.format,
+            engine=engine,
+            priority=priority.BATCH,
+            route="/tts/batch",
+        )
+
+    return job.run(_submit, concurrency=2 * _scheduler.workers)
+
+
+async def _run_job(job: BatchJob) -> None:
+    future = _registry.acquire(job.model)
+    try:
+        engine = await asyncio.shield(asyncio.wrap_future(future))
+        job.sample_rate = engine.sample_rate
+        async for _ in _batch_results(job, engine):
+            pass
+    except asyncio.CancelledError:
+        if job.finished is None:
+            job.status, job.finished = "cancelled", time.time()
+        raise
+    except Exception as e:
+        logger.exception("Batch job %s failed", job.id)
+        for item in job.items:
+            if item.status == "pending":
+                item.status, item.error = "failed", str(e)
+        job.status = "done"
+        job.finished = time.time()
+    finally:
+        _registry.release(job.model)
+
+
+@app.post("/tts/batch")
+async def tts_batch_api(request: Request, body: BatchBody):
+    """Render many utterances in one call.
+
+    `mode=zip` streams a ZIP (one `<id>.<format>` member per item, in
+    completion order, then `manifest.json`) over this request. `mode=job`
+    answers 202 with a job id at once; poll `GET /tts/batch/{job_id}`,
+    then fetch items or the whole ZIP when done.
+    """
+    _require_engine()
+    job = _batch_job(body)
+
+    if body.mode == "job":
+        try:
+            _jobs.add(job)
+        except TooManyJobsError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        job.task = asyncio.create_task(_run_job(job))
+        return JSONResponse(
+            {**job.summary(items=False), "status_url": f"/tts/batch/{job.id}"},
+            status_code=202,
+            headers={"Location": f"/tts/batch/{job.id}"},
+        )
+    if body.mode != "zip":
+        raise HTTPException(status_code=422, detail="mode must be zip or job")
+
+    engine = await _acquire_engine(request, job.model)
+    if engine is None:
+        return Response(status_code=_CLIENT_CLOSED)
+    job.sample_rate = engine.sample_rate
+
+    async def _body():
+        try:
+            async for chunk in zip_stream(job, _batch_results(job, engine), job.format):
+                yield chunk
+        finally:
+            _registry.release(job.model)
+
+    return StreamingResponse(
+        _body(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="tts-batch-{job.id}.zip"', "X-Job-Id": job.id},
+    )
+
+
+def _get_job(job_id: str) -> BatchJob:
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
+@app.get("/tts/batch/{job_id}")
+def tts_batch_job_api(job_id: str):
+    """Job progress: status, done/failed counts and a per-item summary."""
+    return _get_job(job_id).summary()
+
+
+@app.delete("/tts/batch/{job_id}")
+def tts_batch_cancel_api(job_id: str):
+    """Stop a running job; items already finished stay retrievable."""
+    job = _get_job(job_id)
+    if job.task is not None and not job.task.done():
+        job.task.cancel()
+    return job.summary(items=False)
+
+
+@app.get("/tts/batch/{job_id}/zip")
+def tts_batch_zip_api(job_id: str):
+    """ZIP of every item finished so far, plus `manifest.json`."""
+    job = _get_job(job_id)
+    return Response(
+        zip_bytes(job, job.format),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="tts-batch-{job.id}.zip"'},
+    )
+
+
+@app.get("/tts/batch/{job_id}/items/{item_id}")
+def tts_batch_item_api(job_id: str, item_id: str):
+    job = _get_job(job_id)
+    item = job.item(item_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Unknown item: {item_id}")
+    if item.status != "done":
+        detail = item.error if item.status == "failed" else "not rendered yet"
+        return JSONResponse({"id": item.id, "status": item.status, "detail": detail}, status_code=409)
+    return AudioResponse(
+        item.data,
+        media_type=media_type(job.format, job.sample_rate),
+        headers={"Content-Disposition": f'inline; filename="{entry_name(item, job.format)}"'},
+    )
+
+
+class PrefetchBody(BaseModel):
+    # SCRIPTS name of the step now playing (e.g. "03_video_quiz"); its likely successors are rendered.
+    step: str | None = None
+    # Values for personalized lines, e.g. {"name": "..."}.
+    context: dict[str, str] = {}
+    texts: list[str] = []
+    sid: int = 0
+    speed: float = 1.0
+    format: str = "wav"
+    model: str | None = None
+
+
+@app.post("/tts/prefetch", status_code=202)
+def tts_prefetch_api(body: PrefetchBody):
+    """Synthesize the utterances likely to follow `step` (plus `texts`) into the cache, ahead of time.
+
+    Returns at once. The work runs on a background thread only while no
+    interactive synthesis is waiting, so a later `/tts` call with the same
+    text, sid, speed, format and model is a cache hit. Texts the prompt
+    bank already holds are skipped.
+    """
+    _require_engine()
+    if body.format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=422, detail=f"Unsupported format: {body.format} (choose from {', '.join(AUDIO_FORMATS)})"
+        )
+    if body.model is not None and body.model not in _registry:
+        raise HTTPException(status_code=422, detail=f"Unknown model: {body.model}")
+
+    texts = [t.strip() for t in body.texts if t and t.strip()]
+    if body.step:
+        try:
+            texts += step_texts(body.step, SCRIPTS, body.context)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if len(texts) > _PREFETCH_MAX_TEXTS:
+        raise HTTPException(status_code=422, detail=f"At most {_PREFETCH_MAX_TEXTS} texts per prefetch")
 
-    return StreamingResponse(io.BytesIO(audio_bytes), media_type="audio/wav")
+    if body.format == "wav" and _is_default_model(body.model):
+        texts = [t for t in texts if _prompt_bank.lookup(t, sid=body.sid, speed=body.speed) is None]
+    queued = _prefetcher.add(
+        PrefetchItem(t, sid=body.sid, speed=body.speed, format=body.format, model=body.model) for t in texts
+    )
+    return {"queued": queued, "texts": texts}
@@ -0,0 +1,29 @@
+import asyncio
+
+from tts_adapter import MicroBatchScheduler, StubTTS
+
+
+def test_join_after_last_waiter_cancelled_still_gets_audio():
+    async def scenario():
+        scheduler = MicroBatchScheduler(StubTTS(rtf=0.5), max_wait_ms=0)
+        try:
+            first = asyncio.create_task(scheduler.submit("同一句話"))
+            while not scheduler._flights:
+                await asyncio.sleep(0.01)
+            flight = next(iter(scheduler._flights.values()))
+
+            # The only waiter leaves, cancelling the flight; a duplicate
+            # arrives before the flight has unwound.
+            first.cancel()
+            second = asyncio.create_task(scheduler.submit("同一句話"))
+            await asyncio.sleep(0)
+            assert flight.token.cancelled
+
+            audio = await asyncio.wait_for(second, timeout=10)
+            assert len(audio) > 44
+            assert first.cancelled()
+            assert scheduler.cancelled == 1
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(scenario())
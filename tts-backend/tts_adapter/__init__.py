@@ -1,10 +1,27 @@
 from __future__ import annotations
 
+import json
 import os
+from dataclasses import fields, replace
 from pathlib import Path
 
+from . import cancel, memory, metrics, priority
+from .audio import GeneratedAudio
 from .base import BaseTTS
+from .cache import CachedTTS, SynthesisCache
+from .dsp import SPEED_MODES, mel_distance, time_stretch
+from .jobs import BatchItem, BatchJob, JobStore, TooManyJobsError
+from .pool import EnginePool, PoolBusyError
+from .prefetch import Prefetcher, PrefetchItem, step_texts
+from .prompt_bank import PromptBank, PromptEntry
+from .quantize import parse_targets, quantized_model, quantized_paths
+from .registry import ModelRegistry, ModelSpec
+from .scheduler import MicroBatchScheduler
+from .segmented import SegmentedTTS
 from .sherpa_matcha import SherpaMatchaPaths, SherpaMatchaTTS
+from .stub import StubTTS
+from .tuning import EngineTuning, cpu_slices, engine_tuning, load_engine_config, usable_cpus
+from .warmup import optimized_paths, warm_up, warmup_speeds_from_env
 
 
 def _pick_latest_model_steps(model_dir: Path) -> str | None:
@@ -26,13 +43,27 @@ def _pick_latest_model_steps(model_dir: Path) -> str | None:
     return str(candidates[-1][1])
 
 
-def create_tts_engine() -> BaseTTS:
-    """Create a TTS engine instance.
+def create_synthesis_cache() -> SynthesisCache | None:
+    """Build the synthesis cache from env, or None when both tiers are disabled."""
+    max_bytes = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    disk_dir = os.environ.get("TTS_CACHE_DIR", "")
+    if max_bytes <= 0 and not disk_dir:
+        return None
+    return SynthesisCache(max_bytes=max_bytes, disk_dir=disk_dir or None)
 
-    For now we default to Sherpa-ONNX MatchaTTS (zh + en).
-    Future backends (VITS / gTTS) can be added behind this factory.
-    """
 
+def create_segment_cache() -> SynthesisCache | None:
+    """Per-segment sample cache under SegmentedTTS; shares TTS_CACHE_DIR (in `segments/`)."""
+    max_bytes = int(os.environ.get("TTS_SEGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    disk_dir = os.environ.get("TTS_CACHE_DIR", "")
+    if max_bytes <= 0 and not disk_dir:
+        return None
+    return SynthesisCache(
+        max_bytes=max_bytes, disk_dir=str(Path(disk_dir) / "segments") if disk_dir else None, name="segment"
+    )
+
+
+def sherpa_matcha_paths_from_env() -> SherpaMatchaPaths:
     # Model paths
     # Sherpa-ONNX Matcha requires:
     # - acoustic_model: model-steps-*.onnx
@@ -79,18 +110,199 @@ def create_tts_engine() -> BaseTTS:
         if fsts:
             rule_fsts = ",".join(fsts)
 
+    return SherpaMatchaPaths(
+        acoustic_model=acoustic_model,
+        vocoder=vocoder,
+        tokens=tokens,
+        lexicon=lexicon,
+        data_dir=data_dir,
+        dict_dir=dict_dir,
+        rule_fsts=rule_fsts,
+    )
+
+
+def default_model_spec() -> ModelSpec:
+    """Describe the engine configured through the TTS_* / SHERPA_MATCHA_* env vars.
+
+    Execution settings (`pool_size`, `num_threads`, `quantize` and the
+    `EngineTuning` fields) may also come from the TTS_ENGINE_CONFIG JSON
+    file; env vars win.
+    """
     # Performance tuning
-    num_threads = int(os.environ.get("TTS_NUM_THREADS", "4"))
-
-    return SherpaMatchaTTS(
-        SherpaMatchaPaths(
-            acoustic_model=acoustic_model,
-            vocoder=vocoder,
-            tokens=tokens,
-            lexicon=lexicon,
-            data_dir=data_dir,
-            dict_dir=dict_dir,
-            rule_fsts=rule_fsts,
-        ),
+    config = load_engine_config()
+    pool_size = max(1, int(os.environ.get("TTS_POOL_SIZE", str(config.get("pool_size", 1)))))
+    cpus = len(usable_cpus())
+    default_threads = min(4, cpus) if pool_size == 1 else max(1, cpus // pool_size)
+    num_threads = int(os.environ.get("TTS_NUM_THREADS", str(config.get("num_threads", default_threads))))
+    quantize = parse_targets(os.environ.get("TTS_QUANTIZE", "") or config.get("quantize", ""))
+
+    backend = os.environ.get("TTS_ENGINE", "sherpa-matcha")
+    return ModelSpec(
+        id=os.environ.get("TTS_DEFAULT_MODEL", "default"),
+        backend=backend,
+        paths=sherpa_matcha_paths_from_env() if backend == "sherpa-matcha" else None,
+        pool_size=pool_size,
         num_threads=num_threads,
+        stub_rtf=float(os.environ.get("TTS_STUB_RTF", "0.1")),
+        tuning=engine_tuning(config),
+        quantize=quantize,
+    )
+
+
+_SPEC_FIELDS = ("pool_size", "num_threads", "stub_rtf", "memory_bytes")
+
+
+def model_specs_from_env(default: ModelSpec) -> list[ModelSpec]:
+    """The default model, every other checkpoint in SHERPA_MATCHA_DIR and the entries of TTS_MODELS_FILE.
+
+    Checkpoints are registered as `steps-<N>` (model-steps-<N>.onnx) and
+    otherwise share the default model's files. TTS_MODELS_FILE is a JSON
+    object of `{"<id>": {...}}`; each entry may set `engine`, `pool_size`,
+    `num_threads`, `stub_rtf`, `memory_bytes`, `quantize` (e.g. `"all"`),
+    any `EngineTuning` field and any `SherpaMatchaPaths` field, and
+    inherits the default model's settings for the rest.
+    """
+    specs = {default.id: default}
+
+    if default.paths is not None:
+        model_dir = Path(os.environ.get("SHERPA_MATCHA_DIR", "models/matcha-zh-en"))
+        for p in sorted(model_dir.glob("model-steps-*.onnx")):
+            steps = p.stem.split("model-steps-", 1)[1]
+            if not steps.isdigit():
+                # Derived files such as the INT8 variant model-steps-3.int8.onnx.
+                continue
+            model_id = "steps-" + steps
+            if str(p) != default.paths.acoustic_model and model_id not in specs:
+                specs[model_id] = replace(
+                    default, id=model_id, paths=replace(default.paths, acoustic_model=str(p)), pool_size=1
+                )
+
+    models_file = os.environ.get("TTS_MODELS_FILE", "")
+    if models_file:
+        entries = json.loads(Path(models_file).read_text(encoding="utf-8"))
+        path_fields = {f.name for f in fields(SherpaMatchaPaths)}
+        tuning_fields = {f.name for f in fields(EngineTuning)}
+        for model_id, entry in entries.items():
+            backend = entry.get("engine", default.backend)
+            paths = None
+            if backend == "sherpa-matcha":
+                base = default.paths or sherpa_matcha_paths_from_env()
+                paths = replace(base, **{k: v for k, v in entry.items() if k in path_fields})
+            overrides = {"pool_size": 1, "memory_bytes": None}
+            overrides.update({k: entry[k] for k in _SPEC_FIELDS if k in entry})
+            overrides["tuning"] = replace(default.tuning, **{k: v for k, v in entry.items() if k in tuning_fields})
+            if "quantize" in entry:
+                overrides["quantize"] = parse_targets(entry["quantize"])
+            specs[model_id] = replace(default, id=model_id, backend=backend, paths=paths, **overrides)
+
+    return list(specs.values())
+
+
+def build_engine(
+    spec: ModelSpec, cache: SynthesisCache | None = None, segment_cache: SynthesisCache | None = None
+) -> BaseTTS:
+    """Build the engine described by `spec`: pool -> segmenting front-end -> optional audio cache.
+
+    TTS_SEGMENT_MAX_CHARS bounds the text handed to a single engine call;
+    TTS_SPEED_MODE=wsola|vocoder derives other speeds from speed-1.0 audio;
+    TTS_PRIORITY_LIMITS (e.g. `batch=2,prefetch=1`) caps how many pool
+    engines each background class may hold.
+    """
+    if spec.backend == "stub":
+        engines: list[BaseTTS] = [StubTTS(rtf=spec.stub_rtf) for _ in range(spec.pool_size)]
+    elif spec.backend == "sherpa-matcha":
+        paths = spec.paths
+        if spec.quantize:
+            paths = quantized_paths(paths, spec.quantize)
+        optimized_dir = os.environ.get("TTS_ORT_OPTIMIZED_DIR", "")
+        if optimized_dir:
+            paths = optimized_paths(paths, optimized_dir)
+        slices = cpu_slices(spec.pool_size) if spec.tuning.pin_threads else [None] * spec.pool_size
+        engines = [
+            SherpaMatchaTTS(paths, num_threads=spec.num_threads, tuning=spec.tuning, cpus=cpus) for cpus in slices
+        ]
+    else:
+        raise ValueError(f"Unknown TTS_ENGINE: {spec.backend}")
+
+    # Background classes leave one engine to interactive requests unless told otherwise.
+    limits = {cls: max(1, spec.pool_size - 1) for cls in (priority.PREFETCH, priority.BATCH)}
+    limits.update(priority.parse_limits(os.environ.get("TTS_PRIORITY_LIMITS", "")))
+    engine: BaseTTS = EnginePool(
+        engines,
+        max_waiters=int(os.environ.get("TTS_POOL_MAX_WAITERS", "32")),
+        timeout=float(os.environ.get("TTS_POOL_TIMEOUT", "30")),
+        limits=limits,
+    )
+
+    engine = SegmentedTTS(
+        engine,
+        segment_cache,
+        max_chars=int(os.environ.get("TTS_SEGMENT_MAX_CHARS", "60")),
+        speed_mode=os.environ.get("TTS_SPEED_MODE", "native"),
+    )
+
+    if cache is not None:
+        engine = CachedTTS(engine, cache)
+    return engine
+
+
+def create_tts_engine() -> BaseTTS:
+    """Create a TTS engine instance.
+
+    For now we default to Sherpa-ONNX MatchaTTS (zh + en).
+    Future backends (VITS / gTTS) can be added behind this factory.
+
+    Engines live in a pool of TTS_POOL_SIZE independent instances so
+    concurrent requests run in parallel; size it so that
+    TTS_POOL_SIZE x TTS_NUM_THREADS roughly matches the core count.
+
+    TTS_ENGINE=stub swaps in a model-free StubTTS (benchmarks, local tests).
+    TTS_QUANTIZE=all (or `acoustic` / `vocoder`) runs INT8 variants of the
+    models, made beforehand with `quantize_models.py` or on first load.
+    """
+    return build_engine(default_model_spec(), create_synthesis_cache(), create_segment_cache())
+
+
+def create_model_registry() -> ModelRegistry:
+    """Registry of every selectable model; all share the same synthesis and segment caches.
+
+    TTS_MODEL_MEMORY_BUDGET caps the estimated bytes of loaded models and
+    TTS_RSS_LIMIT the worker's measured RSS (0 = unlimited); idle
+    non-default models are evicted LRU to stay under both.
+    """
+    cache = create_synthesis_cache()
+    segment_cache = create_segment_cache()
+    default = default_model_spec()
+    return ModelRegistry(
+        model_specs_from_env(default),
+        build=lambda spec: build_engine(spec, cache, segment_cache),
+        default=default.id,
+        memory_budget=int(os.environ.get("TTS_MODEL_MEMORY_BUDGET", str(1024 * 1024 * 1024))),
+        rss_limit=int(os.environ.get("TTS_RSS_LIMIT", "0")),
+    )
+
+
+def _pool_size(engine: BaseTTS) -> int:
+    """Engines in the `EnginePool` under `engine`'s cache / segmenting wrappers (1 without a pool)."""
+    while not isinstance(engine, EnginePool):
+        engine = getattr(engine, "engine", None)
+        if engine is None:
+            return 1
+    return engine.size
+
+
+def create_scheduler(engine: BaseTTS) -> MicroBatchScheduler:
+    """Micro-batching front for `engine`; TTS_BATCH_MAX_WAIT_MS=0 only coalesces already-queued requests.
+
+    Synthesis runs on TTS_EXECUTOR_WORKERS threads (default: one per engine
+    in `engine`'s pool, however its size was configured); up to
+    TTS_POOL_MAX_WAITERS further requests may queue behind them.
+    """
+    pool_size = _pool_size(engine)
+    return MicroBatchScheduler(
+        engine,
+        max_batch_size=int(os.environ.get("TTS_BATCH_MAX_SIZE", "8")),
+        max_wait_ms=float(os.environ.get("TTS_BATCH_MAX_WAIT_MS", "2")),
+        workers=int(os.environ.get("TTS_EXECUTOR_WORKERS", str(pool_size))),
+        max_pending=int(os.environ.get("TTS_POOL_MAX_WAITERS", "32")),
     )
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import io
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+import soundfile as sf
+
+# RIFF/data size used when the total length is unknown (streaming). Browsers
+# and most decoders treat it as "read until EOF".
+_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+@dataclass(frozen=True)
+class GeneratedAudio:
+    """Mono float32 samples in [-1, 1] plus their sample rate."""
+
+    samples: np.ndarray
+    sample_rate: int
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / float(self.sample_rate) if self.sample_rate else 0.0
+
+
+# name -> (media type, soundfile container, soundfile subtype); None = PCM16 written by hand.
+AUDIO_FORMATS: dict[str, tuple[str, str | None, str | None]] = {
+    "wav": ("audio/wav", None, None),
+    "pcm": ("audio/L16", None, None),
+    "flac": ("audio/flac", "FLAC", "PCM_16"),
+    "ogg": ("audio/ogg", "OGG", "VORBIS"),
+    "opus": ("audio/ogg; codecs=opus", "OGG", "OPUS"),
+}
+# Opus needs libsndfile >= 1.0.29; drop whatever the installed build lacks.
+AUDIO_FORMATS = {
+    name: spec
+    for name, spec in AUDIO_FORMATS.items()
+    if spec[1] is None or spec[2] in sf.available_subtypes(spec[1])
+}
+
+
+def media_type(fmt: str, sample_rate: int = 16000) -> str:
+    if fmt == "pcm":
+        return f"audio/L16; rate={sample_rate}; channels=1"
+    return AUDIO_FORMATS[fmt][0]
+
+
+def _pcm16_into(samples: np.ndarray, out: memoryview) -> None:
+    scaled = np.clip(samples, -1.0, 1.0)
+    np.multiply(scaled, 32767.0, out=scaled)
+    np.frombuffer(out, dtype="<i2")[:] = scaled
+
+
+def pcm16(samples) -> bytes:
+    """Convert float samples to little-endian 16-bit PCM."""
+    arr = np.asarray(samples, dtype=np.float32)
+    out = bytearray(2 * len(arr))
+    _pcm16_into(arr, memoryview(out))
+    return bytes(out)
+
+
+def encode(audio: GeneratedAudio, fmt: str = "wav") -> bytes | memoryview:
+    """Encode samples as `fmt` (see AUDIO_FORMATS).
+
+    wav/pcm convert the float samples straight into one preallocated buffer
+    (header included) and return a view of it, so the response body is the
+    only copy of the PCM data.
+    """
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio format: {fmt}")
+
+    samples = np.asarray(audio.samples, dtype=np.float32)
+    _, container, subtype = AUDIO_FORMATS[fmt]
+    if container is None:
+        header = wav_header(audio.sample_rate, data_size=2 * len(samples)) if fmt == "wav" else b""
+        out = bytearray(len(header) + 2 * len(samples))
+        out[: len(header)] = header
+        view = memoryview(out)
+        _pcm16_into(samples, view[len(header) :])
+        return view
+
+    buf = io.BytesIO()
+    sf.write(buf, samples, audio.sample_rate, format=container, subtype=subtype)
+    return buf.getbuffer()
+
+
+def wav_header(sample_rate: int, *, data_size: int | None = None, num_channels: int = 1) -> bytes:
+    """44-byte PCM16 WAV header; `data_size=None` marks a stream of unknown length."""
+    bits = 16
+    block_align = num_channels * bits // 8
+    if data_size is None:
+        riff_size = data_size = _UNKNOWN_SIZE
+    else:
+        riff_size = 36 + data_size
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        riff_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        num_channels,
+        sample_rate,
+        sample_rate * block_align,
+        block_align,
+        bits,
+        b"data",
+        data_size,
+    )
@@ -1,10 +1,55 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
+
+from . import cancel, metrics
+from .audio import GeneratedAudio, encode
+from .text import split_sentences
 
 
 class BaseTTS(ABC):
     @abstractmethod
-    def synthesize(self, text: str, *, sid: int = 0, speed: float = 1.0) -> bytes:
-        """Return WAV bytes (PCM) for the given text."""
+    def generate(self, text: str, *, sid: int = 0, speed: float = 1.0) -> GeneratedAudio:
+        """Return raw float samples for the given text."""
         raise NotImplementedError
+
+    def synthesize(
+        self, text: str, *, sid: int = 0, speed: float = 1.0, format: str = "wav"
+    ) -> bytes | memoryview:
+        """Return encoded audio (16-bit PCM WAV by default) for the given text."""
+        audio = self.generate(text, sid=sid, speed=speed)
+        with metrics.stage("encode"):
+            return encode(audio, format)
+
+    def synthesize_stream(
+        self, text: str, *, sid: int = 0, speed: float = 1.0
+    ) -> Iterator[GeneratedAudio]:
+        """Yield audio sentence by sentence, so playback can start after the first one."""
+        sentences = split_sentences(text)
+        if not sentences:
+            raise ValueError("text is empty")
+        for sentence in sentences:
+            # Stop between sentences once the consumer has been cancelled.
+            cancel.check()
+            yield self.generate(sentence, sid=sid, speed=speed)
+
+    def warm_up(self, texts: Iterable[str], speeds: Iterable[float]) -> None:
+        """Run each text at each speed once so the first real request pays no warm-up cost."""
+        for speed in speeds:
+            for text in texts:
+                self.generate(text, speed=speed)
+
+    @property
+    def fingerprint(self) -> str:
+        """Identify the loaded model so caches never mix outputs of different models."""
+        return type(self).__name__
+
+    @property
+    def sample_rate(self) -> int:
+        """Output sample rate, needed up front for headerless formats such as raw PCM."""
+        return 16000
+
+    def stats(self) -> dict:
+        """Runtime counters surfaced by `/health`; wrappers merge their own."""
+        return {}
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from . import metrics
+from .audio import GeneratedAudio
+from .base import BaseTTS
+from .text import canonicalize
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used both as the cache key and as the engine input."""
+    return canonicalize(text)
+
+
+def cache_key(text: str, *, sid: int, speed: float, fingerprint: str, format: str = "wav") -> str:
+    payload = json.dumps(
+        [normalize_text(text), int(sid), round(float(speed), 4), fingerprint, format],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    """Two-tier cache of synthesized audio keyed by `cache_key()`.
+
+    - memory: LRU bounded by `max_bytes` (0 disables the tier)
+    - disk: one file per key under `disk_dir`, survives restarts (None disables the tier)
+
+    `name` labels the cache in metrics when several are in use.
+    """
+
+    def __init__(
+        self, *, max_bytes: int = 64 * 1024 * 1024, disk_dir: str | None = None, name: str = "audio"
+    ) -> None:
+        self.name = name
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, bytes | memoryview] = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.disk_dir is not None
+        return self.disk_dir / key[:2] / f"{key}.bin"
+
+    def _remember(self, key: str, data: bytes | memoryview) -> None:
+        # Caller holds the lock.
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def get(self, key: str) -> bytes | memoryview | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.CACHE_LOOKUPS.inc(self.name, "hit")
+                return data
+
+        if self.disk_dir is not None:
+            try:
+                data = self._disk_path(key).read_bytes()
+            except FileNotFoundError:
+                data = None
+            except OSError:
+                logger.warning("Failed to read cache entry %s", key, exc_info=True)
+                data = None
+            if data is not None:
+                with self._lock:
+                    self._remember(key, data)
+                    self.hits += 1
+                    self.disk_hits += 1
+                metrics.CACHE_LOOKUPS.inc(self.name, "disk_hit")
+                return data
+
+        with self._lock:
+            self.misses += 1
+        metrics.CACHE_LOOKUPS.inc(self.name, "miss")
+        return None
+
+    def put(self, key: str, data: bytes | memoryview) -> None:
+        with self._lock:
+            self._remember(key, data)
+
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+            except OSError:
+                logger.warning("Failed to write cache entry %s", key, exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+class CachedTTS(BaseTTS):
+    """Serve repeated (text, sid, speed) requests from a `SynthesisCache`."""
+
+    def __init__(self, engine: BaseTTS, cache: SynthesisCache) -> None:
+        self.engine = engine
+        self.cache = cache
+
+    @property
+    def fingerprint(self) -> str:
+        return self.engine.fingerprint
+
+    @property
+    def sample_rate(self) -> int:
+        return self.engine.sample_rate
+
+    def synthesize(
+        self, text: str, *, sid: int = 0, speed: float = 1.0, format: str = "wav"
+    ) -> bytes | memoryview:
+        text = normalize_text(text)
+        if not text:
+            raise ValueError("text is empty")
+
+        key = cache_key(text, sid=sid, speed=speed, fingerprint=self.fingerprint, format=format)
+        with metrics.stage("cache"):
+            data = self.cache.get(key)
+        if data is None:
+            data = self.engine.synthesize(text, sid=sid, speed=speed, format=format)
+            self.cache.put(key, data)
+        return data
+
+    def generate(self, text: str, *, sid: int = 0, speed: float = 1.0) -> GeneratedAudio:
+        return self.engine.generate(text, sid=sid, speed=speed)
+
+    def synthesize_stream(
+        self, text: str, *, sid: int = 0, speed: float = 1.0
+    ) -> Iterator[GeneratedAudio]:
+        return self.engine.synthesize_stream(text, sid=sid, speed=speed)
+
+    def warm_up(self, texts: Iterable[str], speeds: Iterable[float]) -> None:
+        self.engine.warm_up(texts, speeds)
+
+    def stats(self) -> dict:
+        return {**self.engine.stats(), "cache": self.cache.stats()}
@@ -0,0 +1,48 @@
+"""Cooperative cancellation for synthesis running in worker threads.
+
+The server creates a `CancelToken` per unit of work and runs the work
+inside `scope(token)`. Engine layers call `check()` at safe points (before
+taking an engine, between streamed segments), so work whose client has
+gone away stops there instead of burning CPU.
+"""
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+
+class SynthesisCancelled(Exception):
+    """Raised at a check point once the work's token has been cancelled."""
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+_current: ContextVar[CancelToken | None] = ContextVar("tts_cancel_token", default=None)
+
+
+@contextmanager
+def scope(token: CancelToken) -> Iterator[CancelToken]:
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check() -> None:
+    token = _current.get()
+    if token is not None and token.cancelled:
+        raise SynthesisCancelled("synthesis cancelled")
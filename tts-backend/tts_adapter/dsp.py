@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import numpy as np
+
+# Output speed variants: "native" asks the model for each speed; the others
+# synthesize at speed 1.0 and time-stretch those samples.
+SPEED_MODES: tuple[str, ...] = ("native", "wsola", "vocoder")
+
+
+def _hann(n: int) -> np.ndarray:
+    # Periodic Hann: shifted copies at 50% / 75% overlap sum to a constant.
+    return (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n) / n)).astype(np.float32)
+
+
+def wsola(samples: np.ndarray, speed: float, sample_rate: int, *, frame_ms: float = 30.0) -> np.ndarray:
+    """Waveform-similarity overlap-add: `speed` x faster, pitch unchanged.
+
+    Output frames are laid down every half frame; each is read from around
+    its nominal input position (time x `speed`), shifted by up to a quarter
+    frame to the offset that best continues the previous frame, which keeps
+    voiced periods intact. Frames are placed one at a time, but every
+    candidate offset of a frame is scored in one `np.correlate` call.
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    n = max(2, int(sample_rate * frame_ms / 1000.0) // 2 * 2)
+    hop = n // 2
+    tol = hop // 2
+    out_len = int(round(len(x) / speed))
+    frames = out_len // hop + 2
+    window = _hann(n)
+
+    # Padding keeps every candidate and continuation slice in bounds.
+    tail = np.zeros(2 * n + 2 * tol + int(hop * speed) + 1, np.float32)
+    padded = np.concatenate([np.zeros(tol, np.float32), x, tail])
+    out = np.zeros(frames * hop + n, np.float32)
+    norm = np.zeros_like(out)
+    prev = tol
+    for k in range(frames):
+        nominal = min(int(k * hop * speed) + tol, len(padded) - n - tol - 1)
+        if k == 0:
+            pos = nominal
+        else:
+            continuation = padded[prev + hop : prev + hop + n]
+            scores = np.correlate(padded[nominal - tol : nominal + tol + n], continuation, "valid")
+            pos = nominal - tol + int(np.argmax(scores))
+        out[k * hop : k * hop + n] += padded[pos : pos + n] * window
+        norm[k * hop : k * hop + n] += window
+        prev = pos
+    out /= np.maximum(norm, 1e-3)
+    return out[:out_len]
+
+
+def phase_vocoder(samples: np.ndarray, speed: float, sample_rate: int, *, n_fft: int = 512) -> np.ndarray:
+    """STFT phase vocoder: `speed` x faster, pitch unchanged.
+
+    Magnitudes are interpolated between analysis frames and phases advanced
+    by each bin's measured instantaneous frequency (one cumulative sum), so
+    the whole stretch is array operations. Tends to sound "phasey" on speech
+    compared with WSOLA.
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    hop = n_fft // 4
+    window = _hann(n_fft)
+    padded = np.concatenate([np.zeros(n_fft, np.float32), x, np.zeros(n_fft, np.float32)])
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop] * window
+    spec = np.fft.rfft(frames, axis=1)
+    if len(spec) < 2:
+        return x.copy()
+
+    steps = np.arange(0.0, len(spec) - 1, speed)
+    lo = steps.astype(int)
+    frac = (steps - lo)[:, None]
+    mag = (1.0 - frac) * np.abs(spec[lo]) + frac * np.abs(spec[lo + 1])
+
+    # Expected phase advance per hop for each bin; the deviation from it is the frequency offset.
+    omega = 2.0 * np.pi * hop * np.arange(spec.shape[1]) / n_fft
+    delta = np.angle(spec[lo + 1]) - np.angle(spec[lo]) - omega
+    delta -= 2.0 * np.pi * np.round(delta / (2.0 * np.pi))
+    phase = np.angle(spec[0]) + np.concatenate([np.zeros((1, spec.shape[1])), np.cumsum(omega + delta, axis=0)[:-1]])
+
+    frames_out = np.fft.irfft(mag * np.exp(1j * phase), n_fft, axis=1).astype(np.float32) * window
+    out = np.zeros(len(frames_out) * hop + n_fft, np.float32)
+    norm = np.zeros_like(out)
+    # Every (n_fft / hop)-th frame tiles the output without overlap, so
+    # overlap-add is a handful of contiguous additions.
+    for r in range(n_fft // hop):
+        tiled = frames_out[r :: n_fft // hop].reshape(-1)
+        out[r * hop : r * hop + len(tiled)] += tiled
+        norm[r * hop : r * hop + len(tiled)] += np.tile(window * window, len(tiled) // n_fft)
+    out /= np.maximum(norm, 1e-3)
+    start = int(round(n_fft / speed))
+    return out[start : start + int(round(len(x) / speed))]
+
+
+def time_stretch(samples: np.ndarray, speed: float, sample_rate: int, *, method: str = "wsola") -> np.ndarray:
+    """`samples` played `speed` x faster without changing pitch (`method`: wsola or vocoder)."""
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    if abs(speed - 1.0) < 1e-6:
+        return np.asarray(samples, dtype=np.float32)
+    if method == "wsola":
+        return wsola(samples, speed, sample_rate)
+    if method == "vocoder":
+        return phase_vocoder(samples, speed, sample_rate)
+    raise ValueError(f"Unknown time-stretch method: {method} (choose from wsola, vocoder)")
+
+
+def _mel_filters(sample_rate: int, n_fft: int, n_mels: int) -> np.ndarray:
+    def _mel(hz):
+        return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+    def _hz(mel):
+        return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+    edges = _hz(np.linspace(_mel(0.0), _mel(sample_rate / 2), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling))
+
+
+def log_mel(samples: np.ndarray, sample_rate: int, *, n_mels: int = 80) -> np.ndarray:
+    """(frames, n_mels) log10 mel power spectrogram, 25 ms windows every 10 ms."""
+    win = int(0.025 * sample_rate)
+    hop = int(0.010 * sample_rate)
+    n_fft = 1 << (win - 1).bit_length()
+    x = np.asarray(samples, dtype=np.float32)
+    if len(x) < win:
+        x = np.pad(x, (0, win - len(x)))
+    frames = np.lib.stride_tricks.sliding_window_view(x, win)[::hop] * np.hanning(win).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2
+    return np.log10(power @ _mel_filters(sample_rate, n_fft, n_mels).T + 1e-10)
+
+
+def _dtw_mean(cost: np.ndarray) -> float:
+    # Steps (1,1), (1,2), (2,1): one row at a time, slopes between 1/2 and 2.
+    # Each cell keeps the cumulative cost and length of its best path.
+    n, m = cost.shape
+    inf = np.inf
+    total = np.full((n, m), inf)
+    steps = np.zeros((n, m))
+    total[0, 0], steps[0, 0] = cost[0, 0], 1
+    for i in range(1, n):
+        options = [(i - 1, 1), (i - 1, 2)] + ([(i - 2, 1)] if i >= 2 else [])
+        best = np.full(m, inf)
+        best_steps = np.zeros(m)
+        for row, shift in options:
+            prev = np.full(m, inf)
+            prev_steps = np.zeros(m)
+            prev[shift:] = total[row, :-shift]
+            prev_steps[shift:] = steps[row, :-shift]
+            better = prev < best
+            best[better], best_steps[better] = prev[better], prev_steps[better]
+        total[i] = best + cost[i]
+        steps[i] = best_steps + 1
+    if not np.isfinite(total[-1, -1]):
+        # Lengths differ by more than 2x; fall back to the diagonal.
+        idx = np.linspace(0, m - 1, n).round().astype(int)
+        return float(cost[np.arange(n), idx].mean())
+    return float(total[-1, -1] / steps[-1, -1])
+
+
+def mel_distance(reference: np.ndarray, candidate: np.ndarray, sample_rate: int) -> dict:
+    """How far `candidate` audio is from `reference`.
+
+    `mel_distance_db`: RMS difference of the log-mel spectra in dB, averaged
+    over DTW-aligned frames (so a slightly different duration is not
+    counted as a spectral error); `duration_ratio`: candidate / reference length.
+    """
+    ref = log_mel(reference, sample_rate)
+    cand = log_mel(candidate, sample_rate)
+    # Ignore differences more than 80 dB below the loudest bin (near-silence).
+    floor = max(ref.max(), cand.max()) - 8.0
+    ref, cand = np.maximum(ref, floor), np.maximum(cand, floor)
+    # Pairwise squared distances without an (n, m, n_mels) intermediate.
+    sq = (ref * ref).sum(1)[:, None] + (cand * cand).sum(1)[None, :] - 2.0 * ref @ cand.T
+    cost = 10.0 * np.sqrt(np.maximum(sq, 0.0) / ref.shape[1])
+    return {
+        "mel_distance_db": round(_dtw_mean(cost), 3),
+        "duration_ratio": round(len(candidate) / len(reference), 4) if len(reference) else None,
+    }
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+
+from .pool import PoolBusyError
+
+
+@dataclass
+class BatchItem:
+    id: str
+    text: str
+    sid: int = 0
+    speed: float = 1.0
+    status: str = "pending"  # pending | done | failed
+    data: bytes | memoryview | None = None
+    error: str | None = None
+    seconds: float = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "bytes": len(self.data) if self.data is not None else 0,
+            "seconds": round(self.seconds, 4),
+            "error": self.error,
+        }
+
+
+class BatchJob:
+    """A list of utterances rendered together; results are kept per item id.
+
+    `run()` synthesizes up to `concurrency` items at a time through `submit`
+    and yields each item as it finishes, so callers can stream results out
+    in completion order. Items rejected because the server is busy are
+    retried after the advertised Retry-After instead of failing.
+    """
+
+    def __init__(self, items: Iterable[BatchItem], *, format: str = "wav", model: str | None = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.items = list(items)
+        self.format = format
+        self.model = model
+        self.status = "queued"  # queued | running | done | cancelled
+        self.created = time.time()
+        self.finished: float | None = None
+        self.task: asyncio.Task | None = None
+        # Output sample rate, known once the model's engine is loaded.
+        self.sample_rate = 16000
+        self._by_id = {item.id: item for item in self.items}
+
+    def item(self, item_id: str) -> BatchItem | None:
+        return self._by_id.get(item_id)
+
+    @property
+    def done(self) -> int:
+        return sum(1 for item in self.items if item.status == "done")
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for item in self.items if item.status == "failed")
+
+    async def run(
+        self,
+        submit: Callable[[BatchItem], Awaitable[bytes | memoryview]],
+        *,
+        concurrency: int,
+    ) -> AsyncIterator[BatchItem]:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def _one(item: BatchItem) -> BatchItem:
+            async with semaphore:
+                start = time.perf_counter()
+                while True:
+                    try:
+                        item.data = await submit(item)
+                        item.status = "done"
+                        break
+                    except PoolBusyError as e:
+                        await asyncio.sleep(min(e.retry_after, 5))
+                    except Exception as e:
+                        item.status = "failed"
+                        item.error = str(e)
+                        break
+                item.seconds = time.perf_counter() - start
+                return item
+
+        self.status = "running"
+        tasks = [asyncio.create_task(_one(item)) for item in self.items]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+            self.status = "done"
+        except (asyncio.CancelledError, GeneratorExit):
+            self.status = "cancelled"
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.finished = time.time()
+
+    def summary(self, *, items: bool = True) -> dict:
+        out = {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "model": self.model,
+            "total": len(self.items),
+            "done": self.done,
+            "failed": self.failed,
+            "created": self.created,
+            "finished": self.finished,
+        }
+        if items:
+            out["items"] = [item.summary() for item in self.items]
+        return out
+
+
+def entry_name(item: BatchItem, ext: str) -> str:
+    """Archive member name; ids that already carry the extension (e.g. SCRIPTS keys) keep it."""
+    return item.id if item.id.endswith(f".{ext}") else f"{item.id}.{ext}"
+
+
+class _ZipSink:
+    # Write-only, unseekable target: zipfile then emits data descriptors, so
+    # each member can be sent as soon as it is written.
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+async def zip_stream(job: BatchJob, results: AsyncIterator[BatchItem], ext: str) -> AsyncIterator[bytes]:
+    """Stream a ZIP of `results` as they arrive, ending with `manifest.json` (the job summary)."""
+    sink = _ZipSink()
+    try:
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+            async for item in results:
+                if item.status == "done":
+                    zf.writestr(entry_name(item, ext), item.data)
+                    yield sink.take()
+            zf.writestr("manifest.json", json.dumps(job.summary(), ensure_ascii=False, indent=2))
+        yield sink.take()
+    finally:
+        # Stops outstanding items right away if the client went away mid-stream.
+        await results.aclose()
+
+
+def zip_bytes(job: BatchJob, ext: str) -> bytes:
+    """ZIP of every finished item of `job` plus `manifest.json`."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for item in job.items:
+            if item.status == "done":
+                zf.writestr(entry_name(item, ext), item.data)
+        zf.writestr("manifest.json", json.dumps(job.summary(), ensure_ascii=False, indent=2))
+    return sink.take()
+
+
+class TooManyJobsError(RuntimeError):
+    """Raised by `JobStore.add` while `max_jobs` jobs are still queued or running."""
+
+
+class JobStore:
+    """Recent batch jobs by id; finished jobs expire after `ttl` seconds or beyond `max_jobs`.
+
+    At most `max_jobs` jobs may be unfinished at once; `add` refuses more.
+    """
+
+    def __init__(self, *, ttl: float = 3600.0, max_jobs: int = 100) -> None:
+        self.ttl = ttl
+        self.max_jobs = max(1, int(max_jobs))
+        self._lock = threading.Lock()
+        self._jobs: dict[str, BatchJob] = {}
+
+    def add(self, job: BatchJob) -> None:
+        with self._lock:
+            self._prune()
+            unfinished = sum(1 for j in self._jobs.values() if j.finished is None)
+            if unfinished >= self.max_jobs:
+                raise TooManyJobsError(f"{unfinished} batch jobs are still queued or running; try again later")
+            self._jobs[job.id] = job
+            self._prune()
+
+    def get(self, job_id: str) -> BatchJob | None:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        # Caller holds the lock. Running jobs are never dropped.
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished is not None), key=lambda j: j.finished
+        )
+        excess = len(self._jobs) - self.max_jobs
+        for job in finished:
+            if now - job.finished > self.ttl or excess > 0:
+                del self._jobs[job.id]
+                excess -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": {
+                    "total": len(self._jobs),
+                    "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+                    "unfinished": sum(1 for job in self._jobs.values() if job.finished is None),
+                }
+            }
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import resource
+import sys
+
+from . import metrics
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c") or None)
+    _malloc_trim = _libc.malloc_trim
+    _malloc_trim.argtypes = [ctypes.c_size_t]
+    _malloc_trim.restype = ctypes.c_int
+except (OSError, AttributeError):
+    # Not glibc (musl, macOS): nothing to trim.
+    _malloc_trim = None
+
+
+def _read_kb(path: str, keys: tuple[str, ...]) -> dict[str, int]:
+    out: dict[str, int] = {}
+    try:
+        with open(path, encoding="ascii") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in keys:
+                    out[name] = int(rest.split()[0]) * 1024
+    except OSError:
+        pass
+    return out
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (cheap; Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return _peak_rss_bytes()
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def process_memory() -> dict:
+    """Memory of this worker process.
+
+    `pss_bytes` divides shared pages among the processes mapping them and
+    `uss_bytes` counts only private pages, so summing either over all
+    workers gives the real footprint of a multi-worker deployment (RSS
+    counts shared pages once per worker).
+    """
+    status = _read_kb("/proc/self/status", ("VmRSS", "VmHWM", "RssAnon", "RssFile", "RssShmem"))
+    rollup = _read_kb("/proc/self/smaps_rollup", ("Pss", "Private_Clean", "Private_Dirty"))
+    out = {
+        "pid": os.getpid(),
+        "rss_bytes": status.get("VmRSS", rss_bytes()),
+        "peak_rss_bytes": status.get("VmHWM", _peak_rss_bytes()),
+    }
+    if status:
+        out["anon_bytes"] = status.get("RssAnon", 0)
+        out["file_bytes"] = status.get("RssFile", 0) + status.get("RssShmem", 0)
+    if rollup:
+        out["pss_bytes"] = rollup.get("Pss", 0)
+        out["uss_bytes"] = rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0)
+    return out
+
+
+def trim() -> bool:
+    """Hand freed heap pages back to the OS (glibc `malloc_trim`); False where unsupported.
+
+    Worth calling after large, short-lived allocations are released — warm-up,
+    model eviction — since glibc otherwise keeps them in its arenas.
+    """
+    if _malloc_trim is None:
+        return False
+    return bool(_malloc_trim(0))
+
+
+def observe() -> dict:
+    """Refresh the process memory gauges; returns `process_memory()`."""
+    mem = process_memory()
+    metrics.PROCESS_RSS.set(mem["rss_bytes"])
+    metrics.PROCESS_PSS.set(mem.get("pss_bytes", mem["rss_bytes"]))
+    return mem
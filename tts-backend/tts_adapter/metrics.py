@@ -0,0 +1,225 @@
+"""Dependency-free Prometheus-style metrics and per-request stage timings.
+
+Metrics are plain module-level objects updated under a lock; rendering to
+the Prometheus text format happens only when `/metrics` is scraped, so the
+cost per observation is a bisect plus a few additions.
+
+Stage timings for the current unit of work are collected through a
+`ContextVar`: wrap the work in `collect()` and every `stage()` /
+`record_stage()` inside it (same thread or context) adds its duration to
+the returned dict, which the server turns into a `Server-Timing` header.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_AUDIO_BUCKETS = (0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+_RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name} {self._value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = _LATENCY_BUCKETS,
+        labelnames: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count], sum
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[i] += 1
+            self._sums[labels] += value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v), self._sums[k]) for k, v in self._counts.items())
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _fmt_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+REQUEST_SECONDS = Histogram(
+    "tts_request_duration_seconds", "End-to-end request latency.", labelnames=("endpoint",)
+)
+REQUESTS_TOTAL = Counter("tts_requests_total", "Requests by endpoint and status.", ("endpoint", "status"))
+IN_FLIGHT = Gauge("tts_requests_in_flight", "Requests currently being handled.")
+STAGE_SECONDS = Histogram(
+    "tts_stage_duration_seconds",
+    "Time per pipeline stage (queue, cache, pool_wait, synth, encode).",
+    labelnames=("stage",),
+)
+AUDIO_SECONDS = Histogram("tts_audio_duration_seconds", "Seconds of audio produced per synthesis.", _AUDIO_BUCKETS)
+RTF = Histogram("tts_real_time_factor", "Synthesis time divided by audio duration.", _RTF_BUCKETS)
+COLD_START_SECONDS = Gauge("tts_cold_start_seconds", "Process start until ready (engine load + warm-up).")
+WARMUP_SECONDS = Gauge("tts_warmup_seconds", "Time spent in the warm-up phase.")
+PROCESS_RSS = Gauge("tts_process_resident_memory_bytes", "Resident set size of this worker.")
+PROCESS_PSS = Gauge(
+    "tts_process_proportional_memory_bytes", "Proportional set size of this worker (shared pages split across workers)."
+)
+CACHE_LOOKUPS = Counter(
+    "tts_cache_lookups_total", "Cache lookups by cache (audio, segment) and result.", ("cache", "result")
+)
+CANCELLED = Counter(
+    "tts_cancelled_total",
+    "Requests whose client disconnected before synthesis finished.",
+    ("endpoint",),
+)
+DEDUPLICATED = Counter(
+    "tts_deduplicated_total",
+    "Requests answered by an identical request's synthesis (same batch window, or joining one in flight).",
+    ("stage",),
+)
+WS_CONNECTIONS = Gauge("tts_ws_connections", "Open /tts/ws connections.")
+FIRST_FRAME_SECONDS = Histogram(
+    "tts_first_frame_seconds", "Utterance request until its first audio frame was sent.", labelnames=("endpoint",)
+)
+PREFETCH = Counter(
+    "tts_prefetch_total", "Speculative syntheses by result (done, expired, dropped, failed).", ("result",)
+)
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+_current: ContextVar[dict[str, float] | None] = ContextVar("tts_stage_timings", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[dict[str, float]]:
+    """Collect stage timings (seconds) recorded in this context."""
+    timings: dict[str, float] = {}
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _current.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_synthesis(seconds: float, audio_seconds: float) -> None:
+    """Record one engine call: its latency, the audio it produced and the resulting RTF."""
+    record_stage("synth", seconds)
+    AUDIO_SECONDS.observe(audio_seconds)
+    if audio_seconds > 0:
+        RTF.observe(seconds / audio_seconds)
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    """Format timings as a `Server-Timing` header value (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000.0:.1f}" for name, seconds in timings.items())
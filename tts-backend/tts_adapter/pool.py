@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Sequence
+
+from . import cancel, metrics, priority
+from .audio import GeneratedAudio
+from .base import BaseTTS
+
+
+# Warm-up waits behind live requests for as long as it takes.
+_WARMUP_CHECKOUT_TIMEOUT = 3600.0
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the wait queue is full or a checkout timed out."""
+
+    def __init__(self, message: str, *, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class EnginePool(BaseTTS):
+    """Fixed set of engine instances with checkout/return semantics.
+
+    Each engine is used by one request at a time. Callers that find no idle
+    engine wait in a bounded queue (`max_waiters`); beyond that, or after
+    `timeout` seconds, `PoolBusyError` is raised so the server can answer 503.
+
+    Waiters are served by priority class (see `priority`), FIFO within a
+    class, and a class never holds more than `limits[class]` engines
+    (default: all of them), so background work can be kept off some engines.
+    """
+
+    def __init__(
+        self,
+        engines: Sequence[BaseTTS],
+        *,
+        max_waiters: int = 32,
+        timeout: float = 30.0,
+        limits: dict[str, int] | None = None,
+    ) -> None:
+        if not engines:
+            raise ValueError("EnginePool needs at least one engine")
+        self.size = len(engines)
+        self.max_waiters = max(0, int(max_waiters))
+        self.timeout = timeout
+
+        self._engines = list(engines)
+        self._idle: deque[BaseTTS] = deque(engines)
+        self._cond = threading.Condition()
+        self._waiting = 0
+        # Moving average of how long an engine is held; drives Retry-After.
+        self._avg_hold = 1.0
+
+        self.limits = {cls: max(1, min(self.size, (limits or {}).get(cls, self.size))) for cls in priority.CLASSES}
+        # Sorted (rank, seq, class) of every caller waiting for an engine.
+        self._queue: list[tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._held: Counter[str] = Counter()
+        self._class_waiting: Counter[str] = Counter()
+        self._class_checkouts: Counter[str] = Counter()
+        self._class_wait_total: Counter[str] = Counter()
+        self._class_wait_max: dict[str, float] = {}
+
+    @property
+    def fingerprint(self) -> str:
+        return self._engines[0].fingerprint
+
+    @property
+    def sample_rate(self) -> int:
+        return self._engines[0].sample_rate
+
+    def _retry_after(self) -> int:
+        # Caller holds the lock.
+        backlog = (self._waiting + 1) / self.size
+        return max(1, math.ceil(self._avg_hold * backlog))
+
+    def _turn(self, entry: tuple[int, int, str]) -> bool:
+        # Caller holds the lock: is `entry` the best queued caller whose class may take an engine?
+        if not self._idle:
+            return False
+        for queued in self._queue:
+            if self._held[queued[2]] < self.limits[queued[2]]:
+                return queued is entry
+        return False
+
+    @contextmanager
+    def checkout(self, timeout: float | None = None) -> Iterator[BaseTTS]:
+        timeout = self.timeout if timeout is None else timeout
+        cls = priority.current()
+        requested = time.perf_counter()
+        with self._cond:
+            entry = (priority.rank(cls), next(self._seq), cls)
+            bisect.insort(self._queue, entry)
+            try:
+                if not self._turn(entry):
+                    if self._waiting >= self.max_waiters:
+                        raise PoolBusyError("TTS engine pool is busy", retry_after=self._retry_after())
+                    self._waiting += 1
+                    self._class_waiting[cls] += 1
+                    try:
+                        if not self._cond.wait_for(lambda: self._turn(entry), timeout=timeout):
+                            raise PoolBusyError(
+                                "Timed out waiting for a TTS engine", retry_after=self._retry_after()
+                            )
+                    finally:
+                        self._waiting -= 1
+                        self._class_waiting[cls] -= 1
+            finally:
+                self._queue.remove(entry)
+            engine = self._idle.popleft()
+            self._held[cls] += 1
+            waited = time.perf_counter() - requested
+            self._class_checkouts[cls] += 1
+            self._class_wait_total[cls] += waited
+            self._class_wait_max[cls] = max(self._class_wait_max.get(cls, 0.0), waited)
+            if self._idle and self._queue:
+                # A caller of another class may be next in line for the remaining engines.
+                self._cond.notify_all()
+
+        start = time.perf_counter()
+        metrics.record_stage("pool_wait", waited)
+        try:
+            yield engine
+        finally:
+            held = time.perf_counter() - start
+            with self._cond:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+                self._idle.append(engine)
+                self._held[cls] -= 1
+                # Eligibility depends on class and order, so wake everyone to re-check.
+                self._cond.notify_all()
+
+    def generate(self, text: str, *, sid: int = 0, speed: float = 1.0) -> GeneratedAudio:
+        # The engine is only held for generation: BaseTTS.synthesize encodes
+        # after it is returned, and streaming checks out once per sentence.
+        cancel.check()
+        with self.checkout() as engine:
+            # Re-check: the caller may have left while we waited for an engine.
+            cancel.check()
+            return engine.generate(text, sid=sid, speed=speed)
+
+    def warm_up(self, texts: Iterable[str], speeds: Iterable[float]) -> None:
+        # Warm every instance in parallel, each under a normal checkout so a
+        # live request never shares it. Nobody returns an engine before all
+        # `size` are checked out, so the checkouts get distinct instances.
+        texts, speeds = list(texts), list(speeds)
+        barrier = threading.Barrier(self.size)
+
+        def _one() -> None:
+            try:
+                with self.checkout(timeout=_WARMUP_CHECKOUT_TIMEOUT) as engine:
+                    engine.warm_up(texts, speeds)
+                    barrier.wait()
+            except threading.BrokenBarrierError:
+                # Another instance failed; its error is the one reported.
+                pass
+            except BaseException:
+                barrier.abort()
+                raise
+
+        with ThreadPoolExecutor(max_workers=self.size) as ex:
+            list(ex.map(lambda _: _one(), range(self.size)))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pool": {
+                    "size": self.size,
+                    "idle": len(self._idle),
+                    "in_use": self.size - len(self._idle),
+                    "waiting": self._waiting,
+                    "max_waiters": self.max_waiters,
+                    "avg_hold_seconds": round(self._avg_hold, 4),
+                    "classes": {
+                        cls: {
+                            "limit": self.limits[cls],
+                            "in_use": self._held[cls],
+                            "waiting": self._class_waiting[cls],
+                            "checkouts": self._class_checkouts[cls],
+                            "avg_wait_ms": round(
+                                1000.0 * self._class_wait_total[cls] / self._class_checkouts[cls], 3
+                            )
+                            if self._class_checkouts[cls]
+                            else 0.0,
+                            "max_wait_ms": round(1000.0 * self._class_wait_max.get(cls, 0.0), 3),
+                        }
+                        for cls in priority.CLASSES
+                    },
+                }
+            }
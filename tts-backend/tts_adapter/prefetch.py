@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Mapping
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Likely next utterances of the experiment script, by SCRIPTS name (without
+# `.wav`). Branches list every candidate: the quiz answer picks 04 correct
+# or wrong, the action answer 06 or 07, the behaviour plan one of the 08s.
+DIALOGUE: dict[str, tuple[str, ...]] = {
+    "00_intro_consent": ("01_greeting",),
+    "01_greeting": ("02_video_intro_after_name",),
+    "02_video_intro_after_name": ("03_video_quiz",),
+    "03_video_quiz": ("04_sustainability_prime_correct", "04_sustainability_prime_wrong"),
+    "04_sustainability_prime_correct": ("05_action_open",),
+    "04_sustainability_prime_wrong": ("05_action_open",),
+    "05_action_open": ("06_action_none", "07_behavior_plan_question"),
+    "06_action_none": ("08_scale_after_none",),
+    "07_behavior_plan_question": ("08_scale_after_yes_answered", "08_scale_after_yes_empty"),
+    "08_scale_after_none": ("09_org_intro",),
+    "08_scale_after_yes_answered": ("09_org_intro",),
+    "08_scale_after_yes_empty": ("09_org_intro",),
+    "09_org_intro": ("10_org_feedback_question",),
+    "10_org_feedback_question": ("11_self_identity_intro",),
+    "11_self_identity_intro": ("12_donation",),
+    "12_donation": ("13_end",),
+}
+
+# Live (non-prerecorded) lines spoken after a step, filled in from the
+# announced context; e.g. the frontend greets the participant by the name
+# given at 01_greeting.
+PERSONALIZED: dict[str, tuple[str, ...]] = {
+    "01_greeting": ("{name}你好",),
+}
+# Same fallback the frontend uses when no name was given.
+DEFAULT_CONTEXT: dict[str, str] = {"name": "同學"}
+
+
+def step_texts(step: str, scripts: Mapping[str, str], context: Mapping[str, str] | None = None) -> list[str]:
+    """Texts likely to be synthesized right after `step`: scripted candidates, then personalized lines."""
+    if step not in DIALOGUE and step not in PERSONALIZED:
+        raise ValueError(f"Unknown dialogue step: {step}")
+    texts = [scripts[f"{name}.wav"].strip() for name in DIALOGUE.get(step, ()) if scripts.get(f"{name}.wav")]
+    values = {**DEFAULT_CONTEXT, **{k: v.strip() for k, v in (context or {}).items() if v and v.strip()}}
+    for template in PERSONALIZED.get(step, ()):
+        try:
+            texts.append(template.format_map(values))
+        except KeyError:
+            continue
+    return texts
+
+
+@dataclass
+class PrefetchItem:
+    text: str
+    sid: int = 0
+    speed: float = 1.0
+    format: str = "wav"
+    model: str | None = None
+    queued: float = field(default_factory=time.monotonic)
+
+    @property
+    def key(self) -> tuple:
+        return (self.text, self.sid, self.speed, self.format, self.model)
+
+
+class Prefetcher:
+    """Synthesize likely next utterances ahead of time, on one low-priority thread.
+
+    `run` renders an item into the cache. An item only starts while
+    `busy()` is false, so speculative work never competes with a waiting
+    request; items older than `max_age` seconds are dropped, as are the
+    oldest ones once `max_queue` are pending. Re-announced items keep their
+    place instead of queueing twice. The thread starts on the first `add()`.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[PrefetchItem], None],
+        *,
+        busy: Callable[[], bool] = lambda: False,
+        max_queue: int = 64,
+        max_age: float = 60.0,
+        poll_interval: float = 0.02,
+    ) -> None:
+        self._run = run
+        self._busy = busy
+        self.max_queue = max(1, int(max_queue))
+        self.max_age = max_age
+        self.poll_interval = poll_interval
+        self._queue: OrderedDict[tuple, PrefetchItem] = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+
+        self.done = 0
+        self.expired = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def add(self, items: Iterable[PrefetchItem]) -> int:
+        """Queue `items`; returns how many were not already pending."""
+        added = 0
+        with self._cond:
+            for item in items:
+                if item.key in self._queue:
+                    continue
+                self._queue[item.key] = item
+                added += 1
+            while len(self._queue) > self.max_queue:
+                self._queue.popitem(last=False)
+                self._count("dropped")
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._loop, name="tts-prefetch", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return added
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._cond.notify()
+
+    def _count(self, result: str) -> None:
+        setattr(self, result, getattr(self, result) + 1)
+        metrics.PREFETCH.inc(result)
+
+    def _next(self) -> PrefetchItem | None:
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._queue:
+                    _, item = next(iter(self._queue.items()))
+                    if now - item.queued <= self.max_age:
+                        break
+                    self._queue.popitem(last=False)
+                    self._count("expired")
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                if self._busy():
+                    # Interactive work is running or queued; look again shortly.
+                    self._cond.wait(self.poll_interval)
+                    continue
+                return self._queue.popitem(last=False)[1]
+            return None
+
+    def _loop(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            try:
+                self._run(item)
+                self._count("done")
+            except Exception:
+                logger.warning("Prefetch of %r failed", item.text[:40], exc_info=True)
+                self._count("failed")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "prefetch": {
+                    "pending": len(self._queue),
+                    "done": self.done,
+                    "expired": self.expired,
+                    "dropped": self.dropped,
+                    "failed": self.failed,
+                }
+            }
@@ -0,0 +1,63 @@
+"""Priority classes for synthesis work.
+
+Work runs inside `scope(<class>)`; the engine pool hands a free engine to
+the highest class waiting (and only while that class is under its
+concurrency limit). Engines are checked out once per text segment, so a
+long low-priority job yields to interactive requests between segments.
+Work outside any scope counts as interactive.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+BATCH = "batch"
+
+# Highest priority first.
+CLASSES: tuple[str, ...] = (INTERACTIVE, PREFETCH, BATCH)
+
+
+def rank(priority: str) -> int:
+    """0 for the highest class; raises ValueError for unknown classes."""
+    try:
+        return CLASSES.index(priority)
+    except ValueError:
+        raise ValueError(f"Unknown priority class: {priority} (choose from {', '.join(CLASSES)})") from None
+
+
+def highest(priorities) -> str:
+    return min(priorities, key=rank)
+
+
+_current: ContextVar[str] = ContextVar("tts_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def scope(priority: str) -> Iterator[str]:
+    rank(priority)
+    reset = _current.set(priority)
+    try:
+        yield priority
+    finally:
+        _current.reset(reset)
+
+
+def current() -> str:
+    return _current.get()
+
+
+def parse_limits(raw: str) -> dict[str, int]:
+    """`"batch=1,prefetch=1"` -> `{"batch": 1, "prefetch": 1}`."""
+    limits = {}
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        rank(name)
+        limits[name] = max(1, int(value))
+    return limits
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping
+
+from .base import BaseTTS
+from .cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".manifest.json"
+
+
+@dataclass(frozen=True)
+class PromptEntry:
+    name: str
+    text: str
+    sid: int
+    speed: float
+    data: bytes | memoryview
+    etag: str
+    media_type: str = "audio/wav"
+
+
+def _etag(data: bytes | memoryview) -> str:
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def _bank_key(text: str, sid: int, speed: float) -> tuple[str, int, float]:
+    return normalize_text(text), int(sid), round(float(speed), 4)
+
+
+class PromptBank:
+    """Index of pre-rendered prompt audio, looked up by name or by (text, sid, speed).
+
+    Files come from the output directory of `generate_fixed_audio.py`: its
+    `.manifest.json` records the text/sid/speed behind every file. Files
+    without a manifest entry can still be matched through `fallback_scripts`
+    (filename -> text, assumed sid 0 / speed 1.0), which covers the WAVs
+    checked into `public/tts/`. Audio is memory-mapped, not read.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_name: dict[str, PromptEntry] = {}
+        self._by_key: dict[tuple[str, int, float], PromptEntry] = {}
+        self._maps: list[mmap.mmap] = []
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def add(self, entry: PromptEntry) -> None:
+        with self._lock:
+            self._by_name[entry.name] = entry
+            self._by_key[_bank_key(entry.text, entry.sid, entry.speed)] = entry
+
+    def get(self, name: str) -> PromptEntry | None:
+        return self._by_name.get(name)
+
+    def lookup(self, text: str, *, sid: int = 0, speed: float = 1.0) -> PromptEntry | None:
+        return self._by_key.get(_bank_key(text, sid, speed))
+
+    def entries(self) -> list[PromptEntry]:
+        with self._lock:
+            return sorted(self._by_name.values(), key=lambda e: e.name)
+
+    def load_dir(self, directory: str | Path, fallback_scripts: Mapping[str, str] | None = None) -> int:
+        """Memory-map every known WAV under `directory`; returns how many were added."""
+        directory = Path(directory)
+        try:
+            manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            manifest = {}
+        except ValueError:
+            logger.warning("Ignoring unreadable prompt manifest in %s", directory)
+            manifest = {}
+        if not isinstance(manifest, dict):
+            logger.warning("Ignoring prompt manifest in %s: not a JSON object", directory)
+            manifest = {}
+
+        specs: dict[str, tuple[str, int, float]] = {}
+        for name, text in (fallback_scripts or {}).items():
+            specs[name] = (text, 0, 1.0)
+        for name, entry in manifest.items():
+            # Older manifests map filename -> hash only; those clips keep the fallback text.
+            try:
+                if not isinstance(entry.get("text"), str):
+                    raise TypeError("missing text")
+                specs[name] = (entry["text"], int(entry.get("sid", 0)), float(entry.get("speed", 1.0)))
+            except (AttributeError, TypeError, ValueError) as e:
+                logger.warning("Skipping prompt manifest entry %s in %s: %s", name, directory, e)
+
+        added = 0
+        for name, (text, sid, speed) in specs.items():
+            path = directory / name
+            if not path.is_file() or path.stat().st_size == 0:
+                continue
+            with path.open("rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mm)
+            data = memoryview(mm)
+            self.add(PromptEntry(name, text, sid, speed, data, _etag(data)))
+            added += 1
+        return added
+
+    def render_missing(self, engine: BaseTTS, scripts: Mapping[str, str]) -> int:
+        """Synthesize (sid 0, speed 1.0) every script that has no entry yet and keep it in memory."""
+        rendered = 0
+        for name, text in scripts.items():
+            if not (text or "").strip() or self.get(name) is not None:
+                continue
+            data = bytes(engine.synthesize(text))
+            self.add(PromptEntry(name, text, 0, 1.0, data, _etag(data)))
+            rendered += 1
+        return rendered
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "prompt_bank": {
+                    "entries": len(self._by_name),
+                    "bytes": sum(len(e.data) for e in self._by_name.values()),
+                }
+            }
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import replace
+from pathlib import Path
+
+from .sherpa_matcha import SherpaMatchaPaths
+
+logger = logging.getLogger(__name__)
+
+TARGETS: tuple[str, ...] = ("acoustic", "vocoder")
+
+# Dynamic INT8 quantization of the matrix multiplications only: weights are
+# stored as int8 and activations quantized on the fly. ConvInteger is often
+# slower than float Conv on CPU, so convolutions stay float unless asked for.
+DEFAULT_OP_TYPES: tuple[str, ...] = ("MatMul", "Gemm")
+
+
+def parse_targets(raw: str) -> tuple[str, ...]:
+    """`"all"` / `"acoustic,vocoder"` / `"vocoder"` -> targets in TARGETS order; `""` / `"none"` -> ()."""
+    names = {part.strip() for part in raw.split(",") if part.strip()} - {"none"}
+    if names & {"all", "both"}:
+        return TARGETS
+    unknown = names - set(TARGETS)
+    if unknown:
+        raise ValueError(
+            f"Unknown quantization target: {', '.join(sorted(unknown))} (choose from all, {', '.join(TARGETS)})"
+        )
+    return tuple(t for t in TARGETS if t in names)
+
+
+def int8_name(src: str) -> str:
+    return f"{Path(src).stem}.int8.onnx"
+
+
+def quantized_model(
+    src: str, out_dir: str, *, op_types: tuple[str, ...] = DEFAULT_OP_TYPES, per_channel: bool = False
+) -> str:
+    """Dynamically quantized INT8 copy of the ONNX model `src` under `out_dir`.
+
+    Reused while newer than `src`. Needs the optional `onnxruntime` package
+    (and `onnx`, which its quantizer imports).
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    dst = target / int8_name(src)
+    if dst.exists() and dst.stat().st_mtime >= os.path.getmtime(src):
+        return str(dst)
+
+    tmp = dst.with_suffix(".tmp")
+    quantize_dynamic(
+        src,
+        tmp,
+        op_types_to_quantize=list(op_types),
+        per_channel=per_channel,
+        weight_type=QuantType.QInt8,
+    )
+    os.replace(tmp, dst)
+    logger.info(
+        "Saved INT8 model %s (%.1f MB -> %.1f MB)", dst, os.path.getsize(src) / 2**20, os.path.getsize(dst) / 2**20
+    )
+    return str(dst)
+
+
+def quantized_paths(paths: SherpaMatchaPaths, targets: tuple[str, ...], out_dir: str = "") -> SherpaMatchaPaths:
+    """Point the `targets` models at their INT8 variants.
+
+    A variant made beforehand (`quantize_models.py`) is used from `out_dir`
+    (TTS_QUANTIZED_DIR) or next to the float model; otherwise it is
+    created in `out_dir`, else next to the model. Without `onnxruntime`, or
+    if quantization fails, the float paths are returned unchanged.
+    """
+    out_dir = out_dir or os.environ.get("TTS_QUANTIZED_DIR", "")
+    fields = {"acoustic": "acoustic_model", "vocoder": "vocoder"}
+    updates = {}
+    for name in targets:
+        src = getattr(paths, fields[name])
+        target_dir = out_dir or str(Path(src).parent)
+        for candidate in (Path(target_dir) / int8_name(src), Path(src).with_name(int8_name(src))):
+            if candidate.exists() and candidate.stat().st_mtime >= os.path.getmtime(src):
+                updates[fields[name]] = str(candidate)
+                break
+        else:
+            try:
+                updates[fields[name]] = quantized_model(src, target_dir)
+            except ImportError:
+                logger.warning("INT8 %s model requested but onnxruntime is not installed; using float", name)
+            except Exception:
+                logger.exception("INT8 quantization of %s failed; using float", src)
+    return replace(paths, **updates)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import astuple, dataclass, field
+from typing import Callable, Iterable
+
+from . import memory
+from .base import BaseTTS
+from .pool import PoolBusyError
+from .sherpa_matcha import SherpaMatchaPaths
+from .tuning import EngineTuning
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """How to build one selectable model: backend, model files and pool layout."""
+
+    id: str
+    backend: str = "sherpa-matcha"
+    paths: SherpaMatchaPaths | None = None
+    pool_size: int = 1
+    num_threads: int = 4
+    stub_rtf: float = 0.1
+    tuning: EngineTuning = EngineTuning()
+    # Models run as INT8 variants (see `quantize.TARGETS`); () = float.
+    quantize: tuple[str, ...] = ()
+    # Overrides the file-size estimate used against the registry's memory budget.
+    memory_bytes: int | None = None
+
+    def estimated_bytes(self) -> int:
+        """Resident size of the built engine: model files (weights) once per pool instance."""
+        if self.memory_bytes is not None:
+            return self.memory_bytes
+        if self.paths is None:
+            return 0
+        per_instance = 0
+        for value in astuple(self.paths):
+            for p in value.split(","):
+                if p and os.path.isfile(p):
+                    per_instance += os.path.getsize(p)
+        return per_instance * self.pool_size
+
+
+@dataclass
+class _Slot:
+    spec: ModelSpec
+    future: Future | None = None
+    active: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    pinned: bool = False
+
+    def state(self) -> str:
+        if self.future is None:
+            return "unloaded"
+        if not self.future.done():
+            return "loading"
+        return "failed" if self.future.exception() is not None else "loaded"
+
+
+class ModelRegistry:
+    """Engines keyed by model id, built on first use and evicted least-recently-used.
+
+    Loads run on a background loader thread and are shared by every request
+    for that model, so a cold model never blocks requests for warm ones.
+    Engines count against `memory_budget` bytes (0 = unlimited); before a
+    load, idle engines are evicted oldest first until it fits, and likewise
+    while the process RSS plus the new model would exceed `rss_limit`
+    (0 = unlimited). The default model is pinned and never evicted. Callers pair `acquire()` with
+    `release()` so engines in use are never chosen for eviction.
+    """
+
+    def __init__(
+        self,
+        specs: Iterable[ModelSpec],
+        *,
+        build: Callable[[ModelSpec], BaseTTS],
+        default: str,
+        memory_budget: int = 0,
+        rss_limit: int = 0,
+        loader_threads: int = 1,
+    ) -> None:
+        self._slots = {spec.id: _Slot(spec) for spec in specs}
+        if default not in self._slots:
+            raise ValueError(f"Default model {default!r} is not registered")
+        self._slots[default].pinned = True
+        self.default = default
+        self.memory_budget = max(0, int(memory_budget))
+        self.rss_limit = max(0, int(rss_limit))
+        self._build = build
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=max(1, loader_threads), thread_name_prefix="tts-model-load")
+
+        self.loads = 0
+        self.evictions = 0
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._slots
+
+    def ids(self) -> list[str]:
+        return sorted(self._slots)
+
+    def _slot(self, model_id: str | None) -> _Slot:
+        slot = self._slots.get(model_id or self.default)
+        if slot is None:
+            raise ValueError(f"Unknown model: {model_id} (choose from {', '.join(self.ids())})")
+        return slot
+
+    def acquire(self, model_id: str | None = None) -> Future:
+        """Mark `model_id` in use and return a future resolving to its engine.
+
+        Starts a background load when the model is not loaded (or its last
+        load failed). Every call must be matched by `release()`, also when
+        the future fails.
+        """
+        with self._lock:
+            slot = self._slot(model_id)
+            slot.active += 1
+            slot.last_used = time.monotonic()
+            if slot.future is None or slot.state() == "failed":
+                slot.future = self._loader.submit(self._load, slot)
+            return slot.future
+
+    def preload(self, model_id: str | None = None) -> BaseTTS:
+        """Build `model_id` on the calling thread and keep it loaded.
+
+        Unlike `acquire()` this never starts the loader thread, so it is safe
+        to call in a parent process that will fork workers afterwards.
+        """
+        with self._lock:
+            slot = self._slot(model_id)
+        engine = self._load(slot)
+        future: Future = Future()
+        future.set_result(engine)
+        with self._lock:
+            slot.future = future
+            slot.last_used = time.monotonic()
+        return engine
+
+    def release(self, model_id: str | None = None) -> None:
+        with self._lock:
+            slot = self._slot(model_id)
+            slot.active = max(0, slot.active - 1)
+            slot.last_used = time.monotonic()
+
+    def _resident_bytes(self, exclude: _Slot | None) -> int:
+        # Caller holds the lock; loading engines count as resident already.
+        return sum(
+            s.spec.estimated_bytes()
+            for s in self._slots.values()
+            if s is not exclude and s.state() in ("loading", "loaded")
+        )
+
+    def _make_room(self, slot: _Slot) -> None:
+        # Caller holds the lock.
+        needed = slot.spec.estimated_bytes()
+        over = 0
+        if self.memory_budget:
+            over = self._resident_bytes(slot) + needed - self.memory_budget
+        if self.rss_limit:
+            over = max(over, memory.rss_bytes() + needed - self.rss_limit)
+        evicted = False
+        while over > 0:
+            idle = [
+                s
+                for s in self._slots.values()
+                if s is not slot and not s.pinned and s.active == 0 and s.state() == "loaded"
+            ]
+            if not idle:
+                raise PoolBusyError(f"No memory budget left to load model {slot.spec.id}", retry_after=5)
+            victim = min(idle, key=lambda s: s.last_used)
+            victim.future = None
+            over -= victim.spec.estimated_bytes()
+            evicted = True
+            self.evictions += 1
+            logger.info("Evicted TTS model %s to make room for %s", victim.spec.id, slot.spec.id)
+        if evicted:
+            # The victims' sessions are freed by now; give their pages back.
+            memory.trim()
+
+    def _load(self, slot: _Slot) -> BaseTTS:
+        with self._lock:
+            self._make_room(slot)
+        start = time.perf_counter()
+        engine = self._build(slot.spec)
+        with self._lock:
+            self.loads += 1
+        logger.info("Loaded TTS model %s in %.2fs", slot.spec.id, time.perf_counter() - start)
+        return engine
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": {
+                    "default": self.default,
+                    "memory_budget": self.memory_budget,
+                    "rss_limit": self.rss_limit,
+                    "resident_bytes": self._resident_bytes(exclude=None),
+                    "loads": self.loads,
+                    "evictions": self.evictions,
+                    "entries": {
+                        model_id: {
+                            "state": slot.state(),
+                            "active": slot.active,
+                            "pinned": slot.pinned,
+                            "estimated_bytes": slot.spec.estimated_bytes(),
+                        }
+                        for model_id, slot in sorted(self._slots.items())
+                    },
+                }
+            }
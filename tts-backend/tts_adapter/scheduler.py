@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from . import cancel, metrics, priority
+from .base import BaseTTS
+from .cache import normalize_text
+from .pool import PoolBusyError
+
+
+@dataclass
+class _Request:
+    text: str
+    sid: int
+    speed: float
+    format: str
+    future: asyncio.Future
+    engine: BaseTTS
+    timings: dict[str, float] | None = None
+    priority: str = priority.INTERACTIVE
+    # Label for the cancellation metric.
+    route: str = "/tts"
+    enqueued: float = field(default_factory=time.perf_counter)
+
+    @property
+    def key(self) -> tuple[BaseTTS, str, int, float, str]:
+        return (self.engine, normalize_text(self.text), self.sid, self.speed, self.format)
+
+
+@dataclass
+class _Flight:
+    # Everyone waiting on one running synthesis; grows as duplicates join.
+    waiters: list[_Request]
+    token: cancel.CancelToken = field(default_factory=cancel.CancelToken)
+    work: asyncio.Future | None = None
+
+    def join(self, req: _Request) -> None:
+        self.waiters.append(req)
+        req.future.add_done_callback(self.abandoned)
+
+    def abandoned(self, _: asyncio.Future) -> None:
+        if not self.token.cancelled and all(req.future.cancelled() for req in self.waiters):
+            self.token.cancel()
+            # Resolves the asyncio wrapper at once; an executor thread that
+            # already started runs on until its next `cancel.check()`.
+            if self.work is not None:
+                self.work.cancel()
+
+
+class MicroBatchScheduler:
+    """Coalesce requests that arrive within a short window and dispatch them together.
+
+    sherpa-onnx has no batched `generate`, so a batch is dispatched as one
+    unit to the engine pool: identical (text, sid, speed, format) items are
+    synthesized once, and the distinct ones run concurrently across the
+    pool's engines. Results are fanned back out to every waiting caller.
+    Requests identical (normalized text, sid, speed, format, engine) to one
+    already being synthesized do not queue at all; they wait for that
+    synthesis ("single flight"), so a burst of N duplicates costs one.
+
+    Work runs on a dedicated executor with one thread per engine, so excess
+    work waits in the executor queue where it can still be dropped: when
+    every caller of a group has gone away (its future was cancelled), the
+    group is never started, or stops at the next cancellation check point if
+    it already was. At most `max_pending` requests may be outstanding beyond
+    the executor's workers; more are rejected with `PoolBusyError`.
+
+    Each priority class has its own executor and its own pending limit, so
+    background work never occupies the threads or queue slots interactive
+    requests need; which class gets a free engine is up to the pool.
+    """
+
+    def __init__(
+        self,
+        engine: BaseTTS,
+        *,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 2.0,
+        workers: int = 1,
+        max_pending: int = 32,
+        executor: Executor | None = None,
+    ) -> None:
+        self.engine = engine
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.workers = max(1, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self._owns_executor = executor is None
+        self.executors: dict[str, Executor] = {
+            cls: executor or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"tts-synth-{cls}")
+            for cls in priority.CLASSES
+        }
+
+        self._queue: asyncio.Queue[_Request] | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes: Counter[int] = Counter()
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self.outstanding = 0
+        self.cancelled = 0
+        self._flights: dict[tuple[BaseTTS, str, int, float, str], _Flight] = {}
+        # Requests answered by another identical request's synthesis: same
+        # batch window ("window") or joining one already running ("in_flight").
+        self.coalesced = 0
+        self.joined = 0
+        self._class_outstanding: Counter[str] = Counter()
+        self._class_queued: Counter[str] = Counter()
+        self._class_requests: Counter[str] = Counter()
+        self._class_delay_total: Counter[str] = Counter()
+        self._class_delay_max: dict[str, float] = {}
+        # Moving average of one group's synthesis time; drives Retry-After.
+        self._avg_work = 1.0
+
+    @property
+    def executor(self) -> Executor:
+        """Executor for interactive work (also used for streaming)."""
+        return self.executors[priority.INTERACTIVE]
+
+    def pending(self, cls: str) -> int:
+        """Requests of class `cls` submitted and not yet answered."""
+        return self._class_outstanding[cls]
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._owns_executor:
+            for executor in self.executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(
+        self,
+        text: str,
+        *,
+        sid: int = 0,
+        speed: float = 1.0,
+        format: str = "wav",
+        timings: dict[str, float] | None = None,
+        engine: BaseTTS | None = None,
+        priority: str = priority.INTERACTIVE,
+        route: str = "/tts",
+    ) -> bytes | memoryview:
+        """Synthesize via the next batch; stage timings are merged into `timings` if given.
+
+        `engine` overrides the scheduler's engine for this request (e.g. a
+        non-default model from the registry); requests only coalesce per engine.
+        `priority` is the request's class; the queue limit applies per class.
+        `route` labels the request in the cancellation metric.
+
+        Cancelling the awaiting task (e.g. because the client disconnected)
+        withdraws the request; its synthesis is dropped if no one else shares it.
+        """
+        await self.start()
+        assert self._queue is not None
+        cls = priority
+        future = asyncio.get_running_loop().create_future()
+        req = _Request(text, sid, speed, format, future, engine or self.engine, timings, cls, route)
+        flight = self._live_flight(req.key)
+        # Joining a running synthesis costs nothing, so only new work counts against the limit.
+        queued = self._class_queued[cls]
+        if flight is None and queued >= self.workers + self.max_pending:
+            backlog = (queued + 1) / self.workers
+            raise PoolBusyError("TTS queue is full", retry_after=max(1, math.ceil(self._avg_work * backlog)))
+        self.outstanding += 1
+        self._class_outstanding[cls] += 1
+        if flight is None:
+            self._class_queued[cls] += 1
+        try:
+            if flight is not None:
+                self._join(flight, [req])
+            else:
+                await self._queue.put(req)
+            return await future
+        finally:
+            self.outstanding -= 1
+            self._class_outstanding[cls] -= 1
+            if flight is None:
+                self._class_queued[cls] -= 1
+
+    async def _collect(self) -> list[_Request]:
+        assert self._queue is not None
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                else:
+                    # Window closed: still take whatever is already queued.
+                    batch.append(self._queue.get_nowait())
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            self._record(batch)
+            # Dispatch without awaiting so the next window starts collecting
+            # while this batch is still synthesizing.
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def _record(self, batch: list[_Request]) -> None:
+        now = time.perf_counter()
+        self.batches += 1
+        self.requests += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        for req in batch:
+            delay = now - req.enqueued
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+            self._class_requests[req.priority] += 1
+            self._class_delay_total[req.priority] += delay
+            self._class_delay_max[req.priority] = max(self._class_delay_max.get(req.priority, 0.0), delay)
+            metrics.record_stage("queue", delay)
+            if req.timings is not None:
+                req.timings["queue"] = delay
+
+    def _join(self, flight: _Flight, reqs: list[_Request]) -> None:
+        for req in reqs:
+            flight.join(req)
+        self.joined += len(reqs)
+        metrics.DEDUPLICATED.inc("in_flight", amount=len(reqs))
+
+    async def _dispatch(self, batch: list[_Request]) -> None:
+        loop = asyncio.get_running_loop()
+        groups: dict[tuple[BaseTTS, str, int, float, str], list[_Request]] = {}
+        for req in batch:
+            groups.setdefault(req.key, []).append(req)
+        coalesced = len(batch) - len(groups)
+        if coalesced:
+            self.coalesced += coalesced
+            metrics.DEDUPLICATED.inc("window", amount=coalesced)
+
+        async def _one(key: tuple[BaseTTS, str, int, float, str], waiters: list[_Request]) -> None:
+            engine = key[0]
+            text, sid, speed, format = waiters[0].text, waiters[0].sid, waiters[0].speed, waiters[0].format
+            if all(req.future.done() for req in waiters):
+                self._drop(waiters)
+                return
+            live = self._live_flight(key)
+            if live is not None:
+                # Queued before an identical synthesis started; wait for that one.
+                self._join(live, waiters)
+                return
+            flight = _Flight([])
+            for req in waiters:
+                flight.join(req)
+            token = flight.token
+            # A group shared by several classes runs at the highest of them.
+            cls = priority.highest(req.priority for req in waiters)
+
+            def _work() -> tuple[bytes | memoryview, dict[str, float]]:
+                start = time.perf_counter()
+                # Re-read: an interactive duplicate may have joined a background flight.
+                current = priority.highest(req.priority for req in list(flight.waiters))
+                with cancel.scope(token), priority.scope(current), metrics.collect() as timings:
+                    cancel.check()
+                    result = engine.synthesize(text, sid=sid, speed=speed, format=format)
+                self._avg_work = 0.8 * self._avg_work + 0.2 * (time.perf_counter() - start)
+                return result, timings
+
+            self._flights[key] = flight
+            flight.work = loop.run_in_executor(self.executors[cls], _work)
+            try:
+                result, timings = await flight.work
+            except (asyncio.CancelledError, cancel.SynthesisCancelled):
+                if not token.cancelled:
+                    raise
+                self._drop([req for req in flight.waiters if req.future.done()])
+                # Joined after the last earlier waiter left; give it a synthesis of its own.
+                for req in flight.waiters:
+                    if not req.future.done():
+                        self._queue.put_nowait(req)
+            except Exception as e:
+                for req in flight.waiters:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+            else:
+                for req in flight.waiters:
+                    if req.timings is not None:
+                        req.timings.update(timings)
+                    if not req.future.done():
+                        req.future.set_result(result)
+            finally:
+                # No await since the fan-out, so no duplicate can have joined too late.
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+        await asyncio.gather(*(_one(key, waiters) for key, waiters in groups.items()))
+
+    def _live_flight(self, key: tuple[BaseTTS, str, int, float, str]) -> _Flight | None:
+        # A cancelled flight is unwinding and will never deliver a result.
+        flight = self._flights.get(key)
+        return flight if flight is not None and not flight.token.cancelled else None
+
+    def _drop(self, waiters: list[_Request]) -> None:
+        self.cancelled += len(waiters)
+        for req in waiters:
+            metrics.CANCELLED.inc(req.route)
+
+    def stats(self) -> dict:
+        return {
+            "scheduler": {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch_size": round(self.requests / self.batches, 3) if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "avg_queue_delay_ms": round(1000.0 * self.queue_delay_total / self.requests, 3)
+                if self.requests
+                else 0.0,
+                "max_queue_delay_ms": round(1000.0 * self.queue_delay_max, 3),
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "outstanding": self.outstanding,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "cancelled": self.cancelled,
+                "deduplicated": {"window": self.coalesced, "in_flight": self.joined},
+                "in_flight": len(self._flights),
+                "classes": {
+                    cls: {
+                        "outstanding": self._class_outstanding[cls],
+                        "requests": self._class_requests[cls],
+                        "avg_queue_delay_ms": round(
+                            1000.0 * self._class_delay_total[cls] / self._class_requests[cls], 3
+                        )
+                        if self._class_requests[cls]
+                        else 0.0,
+                        "max_queue_delay_ms": round(1000.0 * self._class_delay_max.get(cls, 0.0), 3),
+                    }
+                    for cls in priority.CLASSES
+                },
+            }
+        }
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from . import cancel
+from .audio import GeneratedAudio
+from .base import BaseTTS
+from .cache import SynthesisCache, cache_key
+from .dsp import SPEED_MODES, time_stretch
+from .text import canonicalize, segment_text
+
+
+class SegmentedTTS(BaseTTS):
+    """Normalize text, split it into bounded segments and synthesize them one by one.
+
+    Keeps every engine call short (memory and latency grow faster than
+    linearly with input length) and caches float samples per segment, so a
+    sentence shared by several prompts — e.g. the trailing sentence of the
+    `08_scale_after_*` variants — is synthesized only once.
+
+    With `speed_mode` "wsola" or "vocoder", segments are synthesized (and
+    cached) at speed 1.0 only and other speeds are time-stretched from
+    those samples, so a new speed costs DSP instead of a model pass.
+    """
+
+    def __init__(
+        self,
+        engine: BaseTTS,
+        cache: SynthesisCache | None = None,
+        *,
+        max_chars: int = 60,
+        speed_mode: str = "native",
+    ) -> None:
+        if speed_mode not in SPEED_MODES:
+            raise ValueError(f"Unknown speed mode: {speed_mode} (choose from {', '.join(SPEED_MODES)})")
+        self.engine = engine
+        self.cache = cache
+        self.max_chars = max(1, int(max_chars))
+        self.speed_mode = speed_mode
+
+    @property
+    def fingerprint(self) -> str:
+        # Stretched speeds sound different from native ones; keep them apart in the audio cache.
+        if self.speed_mode == "native":
+            return self.engine.fingerprint
+        return f"{self.engine.fingerprint}+{self.speed_mode}"
+
+    @property
+    def sample_rate(self) -> int:
+        return self.engine.sample_rate
+
+    def segments(self, text: str) -> list[str]:
+        segments = segment_text(canonicalize(text), self.max_chars)
+        if not segments:
+            raise ValueError("text is empty")
+        return segments
+
+    def _segment(self, text: str, sid: int, speed: float) -> GeneratedAudio:
+        if self.speed_mode != "native" and speed != 1.0:
+            base = self._synthesized(text, sid, 1.0)
+            samples = time_stretch(base.samples, speed, base.sample_rate, method=self.speed_mode)
+            return GeneratedAudio(samples, base.sample_rate)
+        return self._synthesized(text, sid, speed)
+
+    def _synthesized(self, text: str, sid: int, speed: float) -> GeneratedAudio:
+        if self.cache is None:
+            return self.engine.generate(text, sid=sid, speed=speed)
+
+        key = cache_key(text, sid=sid, speed=speed, fingerprint=self.engine.fingerprint, format="f32")
+        data = self.cache.get(key)
+        if data is not None:
+            return GeneratedAudio(np.frombuffer(data, dtype=np.float32), self.sample_rate)
+        audio = self.engine.generate(text, sid=sid, speed=speed)
+        self.cache.put(key, np.ascontiguousarray(audio.samples, dtype=np.float32).tobytes())
+        return audio
+
+    def generate(self, text: str, *, sid: int = 0, speed: float = 1.0) -> GeneratedAudio:
+        parts = []
+        for segment in self.segments(text):
+            cancel.check()
+            parts.append(self._segment(segment, sid, speed))
+        if len(parts) == 1:
+            return parts[0]
+        return GeneratedAudio(np.concatenate([p.samples for p in parts]), parts[0].sample_rate)
+
+    def synthesize_stream(
+        self, text: str, *, sid: int = 0, speed: float = 1.0
+    ) -> Iterator[GeneratedAudio]:
+        for segment in self.segments(text):
+            cancel.check()
+            yield self._segment(segment, sid, speed)
+
+    def warm_up(self, texts: Iterable[str], speeds: Iterable[float]) -> None:
+        self.engine.warm_up(texts, speeds)
+
+    def stats(self) -> dict:
+        stats = self.engine.stats()
+        if self.cache is not None:
+            stats["segment_cache"] = self.cache.stats()
+        return stats
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
-import io
+import hashlib
 import os
-from dataclasses import dataclass
+import time
+from dataclasses import astuple, dataclass
 
+import numpy as np
 import sherpa_onnx
-import soundfile as sf
 
+from . import metrics
+from .audio import GeneratedAudio
 from .base import BaseTTS
+from .tuning import EngineTuning, model_config_loading, pinned, tuned_model_paths
 
 
 @dataclass(frozen=True)
@@ -20,13 +24,33 @@ class SherpaMatchaPaths:
     dict_dir: str = ""
     rule_fsts: str = ""
 
+    def fingerprint(self) -> str:
+        """Hash of the configured paths plus size/mtime of every model file."""
+        h = hashlib.sha256()
+        for value in astuple(self):
+            h.update(value.encode("utf-8"))
+            h.update(b"\0")
+            for p in value.split(","):
+                if p and os.path.isfile(p):
+                    st = os.stat(p)
+                    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode("ascii"))
+        return h.hexdigest()[:16]
+
 
 class SherpaMatchaTTS(BaseTTS):
+    """One sherpa-onnx `OfflineTts` (acoustic model + vocoder).
+
+    `tuning` sets the provider and per-session thread layout; with `cpus`,
+    the session threads are created on, and synthesis runs on, those CPUs only.
+    """
+
     def __init__(
         self,
         paths: SherpaMatchaPaths,
         *,
         num_threads: int = 4,
+        tuning: EngineTuning | None = None,
+        cpus: tuple[int, ...] | None = None,
     ) -> None:
         if not os.path.exists(paths.acoustic_model):
             raise FileNotFoundError(
@@ -43,16 +67,18 @@ class SherpaMatchaTTS(BaseTTS):
         if paths.lexicon and not os.path.exists(paths.lexicon):
             raise FileNotFoundError(f"Lexicon file not found: {paths.lexicon}")
 
+        tuning = tuning or EngineTuning()
+        acoustic_model, vocoder = tuned_model_paths(paths.acoustic_model, paths.vocoder, tuning)
         model_config = sherpa_onnx.OfflineTtsModelConfig(
             matcha=sherpa_onnx.OfflineTtsMatchaModelConfig(
-                acoustic_model=paths.acoustic_model,
-                vocoder=paths.vocoder,
+                acoustic_model=acoustic_model,
+                vocoder=vocoder,
                 tokens=paths.tokens,
                 lexicon=paths.lexicon,
                 data_dir=paths.data_dir,
                 dict_dir=paths.dict_dir,
             ),
-            provider="cpu",
+            provider=tuning.provider,
             num_threads=num_threads,
             debug=False,
         )
@@ -66,16 +92,30 @@ class SherpaMatchaTTS(BaseTTS):
         if hasattr(config, "validate") and not config.validate():
             raise RuntimeError("Invalid sherpa-onnx TTS config")
 
-        self._tts = sherpa_onnx.OfflineTts(config)
+        self.cpus = cpus
+        tuned = (acoustic_model, vocoder) != (paths.acoustic_model, paths.vocoder)
+        # ORT starts its intra-op threads here; they inherit the affinity.
+        with pinned(cpus), model_config_loading(tuned):
+            self._tts = sherpa_onnx.OfflineTts(config)
+        # Thread layout does not change the audio, so it stays out of the fingerprint.
+        self._fingerprint = f"sherpa-matcha:{paths.fingerprint()}"
 
-    def synthesize(self, text: str, *, sid: int = 0, speed: float = 1.0) -> bytes:
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    @property
+    def sample_rate(self) -> int:
+        return self._tts.sample_rate
+
+    def generate(self, text: str, *, sid: int = 0, speed: float = 1.0) -> GeneratedAudio:
         text = (text or "").strip()
         if not text:
             raise ValueError("text is empty")
 
-        audio = self._tts.generate(text=text, sid=sid, speed=speed)
-
-        buf = io.BytesIO()
-        sf.write(buf, audio.samples, audio.sample_rate, format="WAV")
-        buf.seek(0)
-        return buf.read()
+        start = time.perf_counter()
+        with pinned(self.cpus):
+            audio = self._tts.generate(text=text, sid=sid, speed=speed)
+        result = GeneratedAudio(np.asarray(audio.samples, dtype=np.float32), audio.sample_rate)
+        metrics.record_synthesis(time.perf_counter() - start, result.duration)
+        return result
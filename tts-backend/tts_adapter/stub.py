@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from . import metrics
+from .audio import GeneratedAudio
+from .base import BaseTTS
+
+
+class StubTTS(BaseTTS):
+    """Model-free engine for benchmarking the HTTP/queueing layers and for local tests.
+
+    Produces a quiet tone whose length scales with the text (about
+    `seconds_per_char` of audio per character at speed 1.0) and sleeps for
+    `rtf` x that duration to imitate synthesis cost.
+    """
+
+    def __init__(
+        self,
+        *,
+        rtf: float = 0.1,
+        seconds_per_char: float = 0.2,
+        sample_rate: int = 16000,
+    ) -> None:
+        self.rtf = rtf
+        self.seconds_per_char = seconds_per_char
+        self._sample_rate = sample_rate
+
+    @property
+    def fingerprint(self) -> str:
+        return f"stub:{self.sample_rate}:{self.seconds_per_char}"
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    def generate(self, text: str, *, sid: int = 0, speed: float = 1.0) -> GeneratedAudio:
+        text = (text or "").strip()
+        if not text:
+            raise ValueError("text is empty")
+
+        start = time.perf_counter()
+        duration = len(text) * self.seconds_per_char / max(speed, 1e-3)
+        n = int(duration * self.sample_rate)
+        t = np.arange(n, dtype=np.float32) / self.sample_rate
+        samples = (0.1 * np.sin(2 * np.pi * (220 + 20 * sid) * t)).astype(np.float32)
+        if self.rtf > 0:
+            time.sleep(self.rtf * duration)
+        metrics.record_synthesis(time.perf_counter() - start, duration)
+        return GeneratedAudio(samples, self.sample_rate)
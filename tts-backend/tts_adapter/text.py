@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import re
+
+# A sentence ends at zh/en terminal punctuation (plus any closing quotes),
+# at an English period followed by whitespace, or at a line break.
+_SENTENCE_RE = re.compile(
+    r".+?(?:[。！？!?；;…]+[」』”’\"')）]*|\.(?=\s)|\n|$)",
+    re.S,
+)
+# Clause boundaries used to break up sentences that are still too long.
+_CLAUSE_RE = re.compile(r".+?(?:[，、,：:]+|$)", re.S)
+
+# Full-width ASCII (Ａ, ０, ％ ...) and the ideographic space -> half-width.
+_FULLWIDTH = {c: c - 0xFEE0 for c in range(0xFF01, 0xFF5F)}
+_FULLWIDTH[0x3000] = 0x20
+# ...except punctuation that reads as Chinese; it is canonicalized below instead.
+for _ch in "，！？；：（）":
+    del _FULLWIDTH[ord(_ch)]
+
+_CJK = r"　-〿㐀-䶿一-鿿豈-﫿＀-￯"
+_HALF_TO_FULL = {",": "，", "!": "！", "?": "？", ";": "；", ":": "：", "(": "（", ")": "）"}
+# ASCII punctuation touching a CJK character is written the Chinese way.
+_ZH_PUNCT_RE = re.compile(rf"(?<=[{_CJK}])\s*([,!?;:()])|([,!?;:()])\s*(?=[{_CJK}])")
+_ZH_TO_ASCII = {v: k for k, v in _HALF_TO_FULL.items()}
+# Chinese punctuation between Latin words is written the ASCII way.
+_ASCII_PUNCT_RE = re.compile(r"(?<=[A-Za-z0-9])([，！？；：])(?=\s*[A-Za-z0-9]|\s*$)")
+_ELLIPSIS_RE = re.compile(r"\.{3,}|…+|⋯+")
+_CJK_GAP_RE = re.compile(rf"(?<=[{_CJK}])\s+(?=[{_CJK}])")
+
+
+def canonicalize(text: str) -> str:
+    """Canonical spelling of `text`, so equivalent inputs share cache entries.
+
+    Full-width letters, digits and spaces become ASCII; punctuation next to
+    Chinese becomes full-width (`呢?` -> `呢？`) and punctuation inside
+    English becomes ASCII; runs of dots become `…`; whitespace collapses and
+    disappears between Chinese characters.
+    """
+    text = (text or "").translate(_FULLWIDTH)
+    text = _ELLIPSIS_RE.sub("…", text)
+    text = _ZH_PUNCT_RE.sub(lambda m: _HALF_TO_FULL[m.group(1) or m.group(2)], text)
+    text = _ASCII_PUNCT_RE.sub(lambda m: _ZH_TO_ASCII[m.group(1)], text)
+    text = " ".join(text.split())
+    return _CJK_GAP_RE.sub("", text)
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences for chunk-by-chunk synthesis."""
+    sentences = []
+    for m in _SENTENCE_RE.finditer(text or ""):
+        s = m.group(0).strip()
+        if s:
+            sentences.append(s)
+    return sentences
+
+
+def _hard_split(text: str, max_chars: int) -> list[str]:
+    parts = []
+    while len(text) > max_chars:
+        # Prefer a word boundary so English words stay whole.
+        cut = text.rfind(" ", 0, max_chars + 1)
+        cut = cut if cut > 0 else max_chars
+        parts.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+def segment_text(text: str, max_chars: int = 60) -> list[str]:
+    """Split text into synthesis segments of at most `max_chars` characters.
+
+    Segments follow sentence boundaries; sentences longer than `max_chars`
+    are broken at clause punctuation (packing clauses greedily), and only
+    then at the last space or mid-word.
+    """
+    segments: list[str] = []
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+            continue
+        current = ""
+        for m in _CLAUSE_RE.finditer(sentence):
+            clause = m.group(0)
+            if not clause.strip():
+                continue
+            if len(current) + len(clause) <= max_chars:
+                current += clause
+                continue
+            if current.strip():
+                segments.append(current.strip())
+            current = ""
+            *full, rest = _hard_split(clause.strip(), max_chars)
+            segments.extend(full)
+            current = rest
+        if current.strip():
+            segments.append(current.strip())
+    return segments
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Makes ONNX Runtime apply the `ort_config` metadata entry of a model
+# (intra/inter-op threads, execution mode) over the caller's session options.
+# Only set while a tuned engine creates its sessions; see `model_config_loading`.
+_LOAD_CONFIG_ENV = "ORT_LOAD_CONFIG_FROM_MODEL"
+_load_config_lock = threading.Lock()
+
+_ENV = {
+    "provider": "TTS_PROVIDER",
+    "acoustic_threads": "TTS_ACOUSTIC_THREADS",
+    "vocoder_threads": "TTS_VOCODER_THREADS",
+    "inter_op_threads": "TTS_INTER_OP_THREADS",
+    "pin_threads": "TTS_PIN_THREADS",
+}
+
+
+@dataclass(frozen=True)
+class EngineTuning:
+    """ONNX Runtime execution options of one sherpa-onnx engine.
+
+    sherpa-onnx only takes a provider and one `num_threads` for both
+    sessions. Separate acoustic/vocoder intra-op threads and inter-op
+    threads are applied through an `ort_config` metadata entry in a copy of
+    each model; 0 keeps sherpa-onnx's behaviour (`num_threads`, sequential
+    execution). `pin_threads` gives each pool instance its own slice of the
+    usable CPUs.
+    """
+
+    provider: str = "cpu"
+    acoustic_threads: int = 0
+    vocoder_threads: int = 0
+    inter_op_threads: int = 0
+    pin_threads: bool = False
+
+    def session_options(self, intra_op_threads: int) -> dict | None:
+        """`ort_config` session options for a model run with `intra_op_threads` (0 = untouched)."""
+        if not intra_op_threads and not self.inter_op_threads:
+            return None
+        options = {}
+        if intra_op_threads:
+            options["intra_op_num_threads"] = int(intra_op_threads)
+        if self.inter_op_threads:
+            options["inter_op_num_threads"] = int(self.inter_op_threads)
+            options["execution_mode"] = 1 if self.inter_op_threads > 1 else 0
+        return options
+
+
+def _parse(name: str, raw) -> str | int | bool:
+    if name == "provider":
+        return str(raw)
+    if name == "pin_threads":
+        return str(raw).lower() in ("1", "true", "yes", "on")
+    return max(0, int(raw))
+
+
+def engine_tuning(config: dict | None = None, base: EngineTuning | None = None) -> EngineTuning:
+    """`base` updated from `config` keys, then from the TTS_* env vars (env wins)."""
+    config = config or {}
+    values = {}
+    for f in fields(EngineTuning):
+        env = _ENV[f.name]
+        if os.environ.get(env, ""):
+            values[f.name] = _parse(f.name, os.environ[env])
+        elif f.name in config:
+            values[f.name] = _parse(f.name, config[f.name])
+    return replace(base or EngineTuning(), **values)
+
+
+def load_engine_config() -> dict:
+    """The JSON object in TTS_ENGINE_CONFIG (e.g. written by `benchmark.py tune`), or {}."""
+    path = os.environ.get("TTS_ENGINE_CONFIG", "")
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if not n:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _field(number: int, data: bytes) -> bytes:
+    # Length-delimited protobuf field.
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def configured_model(src: str, options: dict, out_dir: str) -> str:
+    """Copy of the ONNX model `src` carrying `options` as its `ort_config` metadata.
+
+    Appending a field to a serialized protobuf message is a valid message,
+    so `ModelProto.metadata_props` (field 14) is added without the `onnx`
+    package. Copies are keyed by the options and reused while newer than `src`.
+    """
+    payload = json.dumps({"session_options": options}, sort_keys=True)
+    # Keyed by the source path as well: models from different directories may share a stem.
+    digest = hashlib.sha256(f"{os.path.abspath(src)}\0{payload}".encode("utf-8")).hexdigest()[:8]
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    dst = target / f"{Path(src).stem}.ort-{digest}.onnx"
+    if dst.exists() and dst.stat().st_mtime >= os.path.getmtime(src):
+        return str(dst)
+
+    entry = _field(1, b"ort_config") + _field(2, payload.encode("utf-8"))
+    tmp = dst.with_suffix(".tmp")
+    shutil.copyfile(src, tmp)
+    with open(tmp, "ab") as f:
+        f.write(_field(14, entry))
+    os.replace(tmp, dst)
+    logger.info("Wrote %s with session options %s", dst, payload)
+    return str(dst)
+
+
+def tuned_model_paths(acoustic_model: str, vocoder: str, tuning: EngineTuning) -> tuple[str, str]:
+    """Acoustic model and vocoder paths to load for `tuning` (the originals when nothing is set).
+
+    Copies live under TTS_ORT_OPTIMIZED_DIR, else a temp directory. Create
+    the sessions for copies inside `model_config_loading(True)`.
+    """
+    acoustic = tuning.session_options(tuning.acoustic_threads)
+    voc = tuning.session_options(tuning.vocoder_threads)
+    if acoustic is None and voc is None:
+        return acoustic_model, vocoder
+    out_dir = os.environ.get("TTS_ORT_OPTIMIZED_DIR", "") or os.path.join(tempfile.gettempdir(), "tts-ort-config")
+    return (
+        configured_model(acoustic_model, acoustic, out_dir) if acoustic else acoustic_model,
+        configured_model(vocoder, voc, out_dir) if voc else vocoder,
+    )
+
+
+@contextmanager
+def model_config_loading(enabled: bool) -> Iterator[None]:
+    """Let ONNX Runtime apply `ort_config` metadata to sessions created in the block (if `enabled`).
+
+    ORT only reads this from the environment, so the variable is set just
+    for the block and restored after it; engine builds are serialized on a
+    lock, so no other engine's sessions are created while it is set.
+    """
+    with _load_config_lock:
+        if not enabled:
+            yield
+            return
+        previous = os.environ.get(_LOAD_CONFIG_ENV)
+        os.environ[_LOAD_CONFIG_ENV] = "1"
+        try:
+            yield
+        finally:
+            if previous is None:
+                os.environ.pop(_LOAD_CONFIG_ENV, None)
+            else:
+                os.environ[_LOAD_CONFIG_ENV] = previous
+
+
+def usable_cpus() -> list[int]:
+    """CPUs this process may run on (honours cgroup cpusets / taskset)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_slices(count: int) -> list[tuple[int, ...]]:
+    """Split the usable CPUs into `count` disjoint, equal slices (wrapping when there are fewer CPUs)."""
+    cpus = usable_cpus()
+    size = max(1, len(cpus) // max(1, count))
+    return [tuple(cpus[(i * size) % len(cpus) :][:size]) for i in range(count)]
+
+
+@contextmanager
+def pinned(cpus: tuple[int, ...] | None) -> Iterator[None]:
+    """Restrict the calling thread to `cpus` for the duration of the block.
+
+    Threads started inside the block (e.g. ONNX Runtime's intra-op pool
+    during session creation) inherit the mask. No-op off Linux.
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        yield
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
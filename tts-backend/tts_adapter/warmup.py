@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from .base import BaseTTS
+from .sherpa_matcha import SherpaMatchaPaths
+
+logger = logging.getLogger(__name__)
+
+# One zh and one en/mixed sentence: exercises both front-ends (lexicon/fsts
+# and espeak) plus the acoustic model and vocoder at typical lengths.
+WARMUP_TEXTS: tuple[str, ...] = (
+    "你好，很高興認識你，接下來有個簡單的測驗想請你回答。",
+    "Hello, this is a short warm-up sentence. 中英文混合測試。",
+)
+
+
+# EXTENDED keeps the saved graph portable across CPUs; ALL would bake in
+# layout transforms specific to this host.
+_OPTIMIZATION_LEVEL = "ORT_ENABLE_EXTENDED"
+
+
+def warmup_speeds_from_env() -> tuple[float, ...]:
+    raw = os.environ.get("TTS_WARMUP_SPEEDS", "1.0")
+    return tuple(float(s) for s in raw.split(",") if s.strip())
+
+
+def _optimize_one(src: str, out_dir: Path) -> str:
+    import onnxruntime as ort
+
+    # Models from different directories may share a stem; key the copy by source path and settings.
+    digest = hashlib.sha256(f"{os.path.abspath(src)}\0{_OPTIMIZATION_LEVEL}".encode("utf-8")).hexdigest()[:8]
+    dst = out_dir / f"{Path(src).stem}.opt-{digest}.onnx"
+    if dst.exists() and dst.stat().st_mtime >= os.path.getmtime(src):
+        return str(dst)
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = getattr(ort.GraphOptimizationLevel, _OPTIMIZATION_LEVEL)
+    tmp = dst.with_suffix(".tmp")
+    opts.optimized_model_filepath = str(tmp)
+    ort.InferenceSession(src, sess_options=opts, providers=["CPUExecutionProvider"])
+    os.replace(tmp, dst)
+    logger.info("Saved optimized graph %s", dst)
+    return str(dst)
+
+
+def optimized_paths(paths: SherpaMatchaPaths, out_dir: str) -> SherpaMatchaPaths:
+    """Point the acoustic model and vocoder at ONNX Runtime-optimized copies under `out_dir`.
+
+    The copies are created on first boot and reused afterwards, so later
+    boots skip graph optimization. Needs the optional `onnxruntime` package;
+    without it the original paths are returned unchanged.
+    """
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        logger.warning("TTS_ORT_OPTIMIZED_DIR is set but onnxruntime is not installed; skipping")
+        return paths
+
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    try:
+        return replace(
+            paths,
+            acoustic_model=_optimize_one(paths.acoustic_model, target),
+            vocoder=_optimize_one(paths.vocoder, target),
+        )
+    except Exception:
+        logger.exception("ONNX graph optimization failed; using original models")
+        return paths
+
+
+def warm_up(engine: BaseTTS, *, speeds: tuple[float, ...] = (1.0,), texts: tuple[str, ...] = WARMUP_TEXTS) -> float:
+    """Run representative utterances through every engine instance; returns seconds spent."""
+    start = time.perf_counter()
+    engine.warm_up(texts, speeds)
+    elapsed = time.perf_counter() - start
+    logger.info("TTS warm-up finished in %.2fs", elapsed)
+    return elapsed
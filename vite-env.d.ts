@@ -2,6 +2,7 @@
 
 declare interface ImportMetaEnv {
   readonly VITE_TTS_API_BASE_URL?: string;
+  readonly VITE_TTS_TRANSPORT?: 'ws' | 'http';
 }
 
 declare interface ImportMeta {